@@ -0,0 +1,424 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Handles sales analytics endpoints and daily sales rollups
+"""
+
+import datetime
+import json
+import logging
+
+import constants
+import db
+import metrics
+import numpy as np
+from flask import Blueprint, jsonify, request
+from google.cloud import datastore
+from verifyJWT import AuthError, verify_admin
+
+PROJECT_ID = constants.project_id
+ORDERS = constants.orders
+SALES_ROLLUPS = constants.sales_rollups
+BATCH_SIZE = constants.analytics_batch_size
+MAX_DAYS = constants.analytics_max_days
+TASK_DEADLINE = constants.task_deadline
+
+GROUP_BY_VALUES = {"product", "day", "status"}
+
+# Canceled orders count towards their status but not towards sales
+EXCLUDED_STATUSES = {"canceled"}
+
+bp = Blueprint("analytics", __name__, url_prefix="/analytics")
+client = db.client
+logger = logging.getLogger(__name__)
+
+
+def empty_day():
+    """The sales of one day, in the shape stored in a rollup entity."""
+    return {"orders": 0, "total": 0.0, "units": 0, "products": {}, "statuses": {}}
+
+
+def merge_day(into, day):
+    """Adds the sales of day into the sales of into."""
+    into["orders"] += day["orders"]
+    into["total"] += day["total"]
+    into["units"] += day["units"]
+    for product_id, (units, revenue) in day["products"].items():
+        product = into["products"].setdefault(product_id, [0, 0.0])
+        product[0] += units
+        product[1] += revenue
+    for status, (orders, total) in day["statuses"].items():
+        entry = into["statuses"].setdefault(status, [0, 0.0])
+        entry[0] += orders
+        entry[1] += total
+
+
+def order_day(value):
+    """Returns the proleptic ordinal of the UTC date of a datetime."""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return value.date().toordinal()
+
+
+def order_snapshot(order):
+    """
+    Captures what an order contributes to sales, so the contribution can be
+    compared before and after a mutation.
+    """
+    if not order or not order.get("dateCreated"):
+        return None
+
+    lines = tuple(
+        (int(order_product["id"]), order_product["quantity"], order_product["price"])
+        for order_product in order.get("products") or []
+    )
+    return (
+        order_day(order["dateCreated"]),
+        order.get("status"),
+        order.get("total", 0),
+        lines,
+    )
+
+
+class ColumnBatch:
+    """
+    Orders and their lines collected as columns, aggregated per day with
+    NumPy group-by reductions instead of per-line Python loops.
+    """
+
+    def __init__(self):
+        self.order_days = []
+        self.order_statuses = []
+        self.order_counts = []
+        self.order_totals = []
+        self.line_days = []
+        self.line_products = []
+        self.line_quantities = []
+        self.line_prices = []
+
+    def __len__(self):
+        return len(self.order_days) + len(self.line_days)
+
+    def add(self, snapshot, sign=1):
+        day, status, total, lines = snapshot
+        self.order_days.append(day)
+        self.order_statuses.append(status or "")
+        self.order_counts.append(sign)
+        self.order_totals.append(sign * total)
+
+        if status in EXCLUDED_STATUSES:
+            return
+
+        for product_id, quantity, price in lines:
+            self.line_days.append(day)
+            self.line_products.append(product_id)
+            self.line_quantities.append(sign * quantity)
+            self.line_prices.append(price)
+
+    def extend_columns(self, days, product_ids, quantities, prices):
+        """Adds lines that are already columns, such as synthetic ones."""
+        self.line_days.extend(days)
+        self.line_products.extend(product_ids)
+        self.line_quantities.extend(quantities)
+        self.line_prices.extend(prices)
+
+    def reduce(self, days):
+        """Aggregates the batch into days, a dict of day ordinal to sales."""
+        if self.order_days:
+            reduce_orders(
+                days,
+                np.asarray(self.order_days, dtype=np.int64),
+                np.asarray(self.order_statuses),
+                np.asarray(self.order_counts, dtype=np.int64),
+                np.asarray(self.order_totals, dtype=np.float64),
+            )
+
+        if self.line_days:
+            reduce_lines(
+                days,
+                np.asarray(self.line_days, dtype=np.int64),
+                np.asarray(self.line_products, dtype=np.int64),
+                np.asarray(self.line_quantities, dtype=np.int64),
+                np.asarray(self.line_prices, dtype=np.float64),
+            )
+
+
+def reduce_orders(days, order_days, statuses, counts, totals):
+    """Adds order counts and totals per day and status into days."""
+    status_values, status_codes = np.unique(statuses, return_inverse=True)
+    keys = order_days * len(status_values) + status_codes.reshape(-1)
+    groups, inverse = np.unique(keys, return_inverse=True)
+    orders = np.bincount(inverse, weights=counts)
+    total = np.bincount(inverse, weights=totals)
+
+    for key, group_orders, group_total in zip(
+        groups.tolist(), orders.tolist(), total.tolist()
+    ):
+        day, code = divmod(key, len(status_values))
+        status = str(status_values[code])
+        sales = days.setdefault(day, empty_day())
+
+        entry = sales["statuses"].setdefault(status, [0, 0.0])
+        entry[0] += int(group_orders)
+        entry[1] += group_total
+
+        if status not in EXCLUDED_STATUSES:
+            sales["orders"] += int(group_orders)
+            sales["total"] += group_total
+
+
+def reduce_lines(days, line_days, product_ids, quantities, prices):
+    """Adds units and revenue per day and product into days."""
+    day_values, day_codes = np.unique(line_days, return_inverse=True)
+    product_values, product_codes = np.unique(product_ids, return_inverse=True)
+    keys = day_codes.reshape(-1) * len(product_values) + product_codes.reshape(-1)
+    groups, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    units = np.bincount(inverse, weights=quantities)
+    revenue = np.bincount(inverse, weights=quantities * prices)
+    group_days = day_values[groups // len(product_values)]
+    group_products = product_values[groups % len(product_values)]
+
+    for day, product_id, group_units, group_revenue in zip(
+        group_days.tolist(), group_products.tolist(), units.tolist(), revenue.tolist()
+    ):
+        sales = days.setdefault(day, empty_day())
+        product = sales["products"].setdefault(str(product_id), [0, 0.0])
+        product[0] += int(group_units)
+        product[1] += group_revenue
+        sales["units"] += int(group_units)
+
+
+def _rollup_key(day):
+    return client.key(SALES_ROLLUPS, datetime.date.fromordinal(day).isoformat())
+
+
+def _rollup_entity(day, sales):
+    rollup = datastore.Entity(key=_rollup_key(day), exclude_from_indexes=("sales",))
+    rollup["sales"] = json.dumps(sales)
+    return rollup
+
+
+def record_order_change(before, after):
+    """
+    Applies the difference between two order snapshots to the rollup of
+    their day. Past days without a rollup yet are computed from the orders
+    the first time they are queried; the change is only counted on them, so
+    that a rollup being computed from a scan that may have missed it is not
+    stored.
+    """
+    record_order_changes([(before, after)])
+
+
+def record_order_changes(changes):
+    """
+    Applies a list of (before, after) order snapshots at once, with one
+    transaction per day touched rather than one per order. It runs after
+    the orders were written, so a rollup that cannot be updated is logged
+    and counted rather than failing the request.
+    """
+    batch = ColumnBatch()
+    for before, after in changes:
+        if before == after:
+            continue
+        if before:
+            batch.add(before, -1)
+        if after:
+            batch.add(after, 1)
+
+    delta = {}
+    batch.reduce(delta)
+
+    today = datetime.datetime.now(datetime.timezone.utc).date().toordinal()
+    for day, sales in delta.items():
+        try:
+            with client.transaction():
+                rollup = client.get(_rollup_key(day))
+                if rollup and "sales" in rollup:
+                    stored = json.loads(rollup["sales"])
+                    merge_day(stored, sales)
+                    client.put(_rollup_entity(day, stored))
+                elif day < today:
+                    marker = rollup or datastore.Entity(
+                        key=_rollup_key(day), exclude_from_indexes=("changes",)
+                    )
+                    marker["changes"] = marker.get("changes", 0) + 1
+                    client.put(marker)
+        except Exception:
+            logger.exception("Updating the sales rollup of day %s failed", day)
+            metrics.incr("analytics.rollup_errors")
+
+
+def scan_orders(first_day, last_day, only_days=None):
+    """Aggregates the orders created between two day ordinals, inclusive."""
+    start = datetime.datetime.combine(
+        datetime.date.fromordinal(first_day),
+        datetime.time(),
+        tzinfo=datetime.timezone.utc,
+    )
+    end = start + datetime.timedelta(days=last_day - first_day + 1)
+
+    query = client.query(kind=ORDERS)
+    query.add_filter("dateCreated", ">=", start)
+    query.add_filter("dateCreated", "<", end)
+
+    days = {}
+    batch = ColumnBatch()
+    for order in query.fetch():
+        snapshot = order_snapshot(order)
+        if snapshot is None or (only_days and snapshot[0] not in only_days):
+            continue
+
+        batch.add(snapshot)
+        if len(batch) >= BATCH_SIZE:
+            batch.reduce(days)
+            batch = ColumnBatch()
+
+    batch.reduce(days)
+    return days
+
+
+def sales_between(first_day, last_day):
+    """
+    Returns the sales per day between two day ordinals. Past days are read
+    from their rollups and missing rollups are computed and stored; today is
+    always computed from the orders.
+    """
+    today = datetime.datetime.now(datetime.timezone.utc).date().toordinal()
+    past_days = list(range(first_day, min(last_day, today - 1) + 1))
+
+    days = {}
+    # The count of changes each day without a rollup had before the scan
+    changes = {}
+    if past_days:
+        for rollup in client.get_multi([_rollup_key(day) for day in past_days]):
+            day = datetime.date.fromisoformat(rollup.key.name).toordinal()
+            if "sales" in rollup:
+                days[day] = json.loads(rollup["sales"])
+            else:
+                changes[day] = rollup.get("changes", 0)
+
+    missing_days = [day for day in past_days if day not in days]
+    live_days = set(missing_days) | set(range(max(first_day, today), last_day + 1))
+    if live_days:
+        scanned = scan_orders(min(live_days), max(live_days), live_days)
+        days.update(scanned)
+
+        for index in range(0, len(missing_days), 500):
+            store_rollups(missing_days[index : index + 500], scanned, changes)
+
+    for day in range(first_day, last_day + 1):
+        days.setdefault(day, empty_day())
+
+    return days
+
+
+def store_rollups(days, scanned, changes):
+    """
+    Stores the rollups of days computed from a scan, in one transaction,
+    unless another request stored one first or an order of the day changed
+    since the changes were counted: the scan may have missed that change,
+    so the day is computed again the next time it is queried.
+    """
+    with client.transaction():
+        current = {
+            datetime.date.fromisoformat(rollup.key.name).toordinal(): rollup
+            for rollup in client.get_multi([_rollup_key(day) for day in days])
+        }
+        rollups = []
+        for day in days:
+            rollup = current.get(day)
+            if rollup is None or (
+                "sales" not in rollup and rollup.get("changes", 0) == changes.get(day)
+            ):
+                rollups.append(_rollup_entity(day, scanned.get(day, empty_day())))
+            elif "sales" not in rollup:
+                metrics.incr("analytics.rollups_skipped")
+
+        if rollups:
+            client.put_multi(rollups)
+
+
+def group_sales(days, group_by):
+    """Reduces sales per day to the rows of the response."""
+    if group_by == "day":
+        return [
+            {
+                "date": datetime.date.fromordinal(day).isoformat(),
+                "orders": sales["orders"],
+                "total": round(sales["total"], 2),
+                "units": sales["units"],
+            }
+            for day, sales in sorted(days.items())
+        ]
+
+    totals = empty_day()
+    for sales in days.values():
+        merge_day(totals, sales)
+
+    if group_by == "status":
+        return [
+            {"status": status, "orders": orders, "total": round(total, 2)}
+            for status, (orders, total) in sorted(totals["statuses"].items())
+        ]
+
+    rows = [
+        {"productId": int(product_id), "units": units, "revenue": round(revenue, 2)}
+        for product_id, (units, revenue) in totals["products"].items()
+        if units
+    ]
+    rows.sort(key=lambda row: row["revenue"], reverse=True)
+    return rows
+
+
+@bp.route("/sales", methods=["GET"])
+def sales_get():
+    """
+    Return the sales between two dates, grouped by product, day or status
+    """
+    try:
+        verify_admin(request)
+    except AuthError as e:
+        return jsonify(e.error), e.status_code
+
+    if "application/json" not in request.accept_mimetypes:
+        return (
+            jsonify({"Error": "This endpoint only returns JSON data"}),
+            406,
+        )
+
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    group_by = request.args.get("groupBy", "product")
+    try:
+        last = datetime.date.fromisoformat(request.args.get("to", today.isoformat()))
+        first = datetime.date.fromisoformat(
+            request.args.get("from", (last - datetime.timedelta(days=29)).isoformat())
+        )
+    except ValueError:
+        return (
+            jsonify({"Error": "The from and to dates must be formatted YYYY-MM-DD"}),
+            400,
+        )
+
+    if group_by not in GROUP_BY_VALUES or not 0 <= (last - first).days < MAX_DAYS:
+        return (
+            jsonify(
+                {
+                    "Error": f"groupBy must be one of product, day or status, and the window at most {MAX_DAYS} days"
+                }
+            ),
+            400,
+        )
+
+    # Rollups of past days may have to be computed from a scan of the orders
+    db.set_deadline(TASK_DEADLINE)
+    days = sales_between(first.toordinal(), last.toordinal())
+    results = {
+        "from": first.isoformat(),
+        "to": last.isoformat(),
+        "groupBy": group_by,
+        "results": group_sales(days, group_by),
+    }
+    return jsonify(results), 200
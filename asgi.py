@@ -0,0 +1,404 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: ASGI entry point serving the product, order and user reads as async handlers
+# Usage: uvicorn asgi:app --port 8080
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import environ as env
+
+import constants
+import db
+import events
+import httpx
+import main
+import metrics
+import models
+import order
+import product
+import ratelimit
+import snapshot
+import user
+import verifyJWT
+from a2wsgi import WSGIMiddleware
+from dotenv import find_dotenv, load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from verifyJWT import JWKS_URL, AuthError, decode_token, get_token, jwks_unavailable
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+ENV_FILE = find_dotenv()
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
+
+AUTH0_CLIENT_ID = env.get("AUTH0_CLIENT_ID")
+AUTH0_CLIENT_SECRET = env.get("AUTH0_CLIENT_SECRET")
+AUTH0_DOMAIN = env.get("AUTH0_DOMAIN")
+
+USERS = constants.users
+ORDERS = constants.orders
+LIMIT = constants.limit
+WORKERS = constants.asgi_workers
+COMPRESSION_MIN_SIZE = constants.compression_min_size
+COMPRESSION_LEVEL = constants.compression_level
+HTTP_TIMEOUT = httpx.Timeout(
+    constants.http_read_timeout, connect=constants.http_connect_timeout
+)
+HTTP_LIMITS = httpx.Limits(max_connections=constants.http_pool_size)
+
+client = db.client
+# Replaced by benchmarks to stand in for Auth0
+http_transport = None
+
+# Datastore calls block, so they run here; the event loop only waits on them
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="asgi")
+
+
+async def run(func, *args):
+    """
+    Runs a blocking call on the bounded executor, in a copy of the caller's
+    context so that it keeps the deadline of the request.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, func, *args)
+    )
+
+
+def json_response(body, status=200, headers=None):
+    """Serializes like the Flask app, so both modes return the same bytes."""
+    return Response(
+        main.app.json.dumps(body),
+        status,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def accepts_json(request):
+    accept = parse_accept_header(request.headers.get("Accept"), MIMEAccept)
+    return "application/json" in accept
+
+
+def base_url(request):
+    return str(request.url.replace(query=""))
+
+
+class Admission:
+    """
+    Sheds load, charges the request to the same buckets as the Flask app and
+    gives it the same Datastore deadline, before an async handler runs.
+    """
+
+    def __init__(self, app, blueprint=None, hold=True):
+        self.app = app
+        self.blueprint = blueprint
+        self.hold = hold
+
+    async def __call__(self, scope, receive, send):
+        if not ratelimit.enter():
+            response = json_response(
+                {"Error": "The server is too busy, try again later"},
+                503,
+                {"Retry-After": ratelimit.retry_after(1)},
+            )
+            await response(scope, receive, send)
+            return
+
+        held = True
+        try:
+            request = Request(scope)
+            remote_addr = request.client.host if request.client else ""
+            # The Redis limiter does network I/O
+            wait = await run(
+                ratelimit.acquire, self.blueprint, request.headers, remote_addr
+            )
+            if wait > 0:
+                response = json_response(
+                    {"Error": "Too many requests"},
+                    429,
+                    {"Retry-After": ratelimit.retry_after(wait)},
+                )
+                await response(scope, receive, send)
+                return
+
+            if not self.hold:
+                # An open stream is not a request in flight, as in the Flask
+                # app, whose teardown runs before the body is sent
+                ratelimit.leave()
+                held = False
+                await self.app(scope, receive, send)
+                return
+
+            token = db.deadline.set(time.monotonic() + db.REQUEST_DEADLINE)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                db.deadline.reset(token)
+        finally:
+            if held:
+                ratelimit.leave()
+
+
+def admitted(blueprint=None):
+    """The middleware of an async route: admission, then compression."""
+    return [
+        Middleware(Admission, blueprint=blueprint),
+        Middleware(
+            GZipMiddleware,
+            minimum_size=COMPRESSION_MIN_SIZE,
+            compresslevel=COMPRESSION_LEVEL,
+        ),
+    ]
+
+
+_jwks_fetch = None
+
+
+def _forget_jwks(fetch):
+    global _jwks_fetch
+
+    if _jwks_fetch is fetch:
+        _jwks_fetch = None
+
+
+async def _get_jwks(http):
+    response = await http.get(JWKS_URL)
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_jwks(http):
+    """Fetches the signing keys; concurrent callers share one request."""
+    global _jwks_fetch
+
+    if _jwks_fetch is None:
+        metrics.incr("singleflight.jwks.calls")
+        _jwks_fetch = asyncio.ensure_future(_get_jwks(http))
+        _jwks_fetch.add_done_callback(_forget_jwks)
+    else:
+        metrics.incr("singleflight.jwks.coalesced")
+
+    # A caller that goes away must not cancel the fetch for the others
+    return await asyncio.shield(_jwks_fetch)
+
+
+async def verify_jwt(request):
+    token = get_token(request)
+
+    try:
+        jwks = await fetch_jwks(request.app.state.http)
+    except (httpx.HTTPError, ValueError):
+        raise jwks_unavailable()
+
+    # Lets the rate limiter key the next requests by their verified sub
+    verifyJWT.cached_jwks = jwks
+    return decode_token(token, jwks)
+
+
+async def products_get(request):
+    if not accepts_json(request):
+        return json_response({"Error": "The request must accept JSON"}, 406)
+
+    if "ids" in request.query_params:
+        ids = request.query_params["ids"].split(",")
+        results, status = await run(product.find_products, ids, str(request.base_url))
+        return json_response(results, status)
+
+    q_limit = int(request.query_params.get("limit", LIMIT))
+    q_offset = int(request.query_params.get("offset", "0"))
+    results = await run(
+        product.products_page, q_limit, q_offset, str(request.url), base_url(request)
+    )
+    return json_response(results)
+
+
+async def product_get(request):
+    if not accepts_json(request):
+        return json_response({"Error": "This endpoint only returns JSON data"}, 406)
+
+    found = await run(snapshot.get_product, request.path_params["id"])
+    if not found:
+        return json_response({"Error": "No product with this product_id exists"}, 404)
+
+    return json_response(found.to_dict(str(request.url)))
+
+
+async def orders_get(request):
+    try:
+        payload = await verify_jwt(request)
+    except AuthError as e:
+        return json_response(e.error, e.status_code)
+
+    if not accepts_json(request):
+        return json_response({"Error": "The request must accept JSON"}, 406)
+
+    sub = payload["sub"]
+    q_limit = int(request.query_params.get("limit", LIMIT))
+    q_offset = int(request.query_params.get("offset", "0"))
+
+    # The count and the page do not depend on each other
+    total_items, (orders, more) = await asyncio.gather(
+        run(order.count_orders, sub), run(order.orders_page, sub, q_limit, q_offset)
+    )
+    results = order.orders_results(
+        orders,
+        total_items,
+        more,
+        q_limit,
+        q_offset,
+        str(request.url),
+        base_url(request),
+    )
+    return json_response(results)
+
+
+async def order_get(request):
+    try:
+        payload = await verify_jwt(request)
+    except AuthError as e:
+        return json_response(e.error, e.status_code)
+
+    if not accepts_json(request):
+        return json_response({"Error": "This endpoint only returns JSON data"}, 406)
+
+    order_key = client.key(
+        ORDERS, request.path_params["id"], parent=client.key(USERS, payload["sub"])
+    )
+    found = await run(client.get, order_key)
+    if not found:
+        return json_response({"Error": "No order with this order_id exists"}, 404)
+
+    return json_response(models.Order.from_entity(found).to_dict(str(request.url)))
+
+
+async def users_get(request):
+    q_limit = int(request.query_params.get("limit", LIMIT))
+    q_offset = int(request.query_params.get("offset", "0"))
+    results = await run(
+        user.users_page, q_limit, q_offset, str(request.url), base_url(request)
+    )
+    return json_response(results)
+
+
+async def login_post(request):
+    content = json.loads(await request.body())
+    body = {
+        "grant_type": "password",
+        "username": content["username"],
+        "password": content["password"],
+        "client_id": AUTH0_CLIENT_ID,
+        "client_secret": AUTH0_CLIENT_SECRET,
+    }
+    try:
+        r = await request.app.state.http.post(
+            f"https://{AUTH0_DOMAIN}/oauth/token", json=body
+        )
+    except httpx.HTTPError:
+        return json_response(
+            {"Error": "The login service is unavailable, try again later"}, 503
+        )
+
+    return Response(
+        r.content,
+        200 if r.status_code == 200 else 401,
+        media_type="application/json",
+    )
+
+
+async def products_stream(request):
+    product_ids, error = product.stream_product_ids(request.query_params)
+    if error:
+        return json_response({"Error": error}, 400)
+
+    broker = events.get_broker()
+    subscription = broker.subscribe(product_ids, asyncio.get_running_loop())
+    if subscription is None:
+        return json_response({"Error": "Too many open streams, try again later"}, 503)
+
+    async def stream():
+        # Waits on the event loop, so open streams hold none of the threads
+        try:
+            dropped = 0
+            yield "retry: 5000\n\n"
+            while True:
+                event = await subscription.get_async(product.STREAM_HEARTBEAT)
+                frames, dropped = product.stream_frames(subscription, event, dropped)
+                yield frames
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers=product.STREAM_HEADERS
+    )
+
+
+async def datastore_unavailable(request, e):
+    return json_response(
+        {"Error": "The database is unavailable, try again later"},
+        503,
+        {"Retry-After": "1"},
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    async with httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, transport=http_transport
+    ) as http:
+        app.state.http = http
+        yield
+
+
+# Reads and product streams run as async handlers; everything else,
+# including writes and the web pages, is served by the Flask app on a
+# bounded thread pool
+app = Starlette(
+    routes=[
+        Route(
+            "/products/stream",
+            products_stream,
+            methods=["GET"],
+            middleware=[Middleware(Admission, blueprint="product", hold=False)],
+        ),
+        Route(
+            "/products",
+            products_get,
+            methods=["GET"],
+            middleware=admitted("product"),
+        ),
+        Route(
+            "/products/{id:int}",
+            product_get,
+            methods=["GET"],
+            middleware=admitted("product"),
+        ),
+        Route("/orders", orders_get, methods=["GET"], middleware=admitted("order")),
+        Route(
+            "/orders/{id:int}",
+            order_get,
+            methods=["GET"],
+            middleware=admitted("order"),
+        ),
+        Route("/users", users_get, methods=["GET"], middleware=admitted("user")),
+        Route("/login", login_post, methods=["POST"], middleware=admitted()),
+        Mount("/", WSGIMiddleware(main.app, workers=WORKERS)),
+    ],
+    exception_handlers={db.DatastoreUnavailable: datastore_unavailable},
+    lifespan=lifespan,
+)
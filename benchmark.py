@@ -0,0 +1,739 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Offline benchmarks for the hot paths of the app
+# Usage: python benchmark.py [name ...]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import time
+import tracemalloc
+
+# The benchmarks never reach Datastore, but the handler modules create their
+# clients on import; the emulator address lets them do so without credentials,
+# and the benchmarks that go through the handlers run on the in-memory store
+os.environ.setdefault("DATASTORE_EMULATOR_HOST", "localhost:8081")
+os.environ.setdefault("DATASTORE_BACKEND", "memory")
+
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from google.cloud import datastore
+from google.cloud.datastore import helpers
+
+import analytics
+import constants
+import db
+import events
+import fake_datastore
+import json_provider
+
+PROJECT_ID = constants.project_id
+USERS = constants.users
+PRODUCTS = constants.products
+ORDERS = constants.orders
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a benchmark function under name."""
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def measure(func, repeat=5):
+    """Returns the best wall time in seconds of repeat calls of func."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(title, rows):
+    """Prints rows of (label, value) under a title."""
+    print(f"\n{title}")
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f"  {label:<{width}}  {value}")
+
+
+def make_product(product_id, orders=3):
+    product = datastore.Entity(
+        key=datastore.Key(PRODUCTS, product_id, project=PROJECT_ID)
+    )
+    product.update(
+        {
+            "name": f"Product {product_id}",
+            "description": "A very loud speaker " * 10,
+            "price": round(random.uniform(1, 500), 2),
+            "stock": random.randint(0, 100),
+            "orders": [
+                {"id": random.randint(1, 10**15), "quantity": random.randint(1, 5)}
+                for _ in range(orders)
+            ],
+        }
+    )
+    return product
+
+
+def make_order(order_id, products=20, sub="auth0|65737eb618710d662aeb86e4"):
+    order = datastore.Entity(
+        key=datastore.Key(USERS, sub, ORDERS, order_id, project=PROJECT_ID)
+    )
+    now = datetime.datetime.now()
+    lines = []
+    for product_id in range(1, products + 1):
+        line = make_product(product_id)
+        line.pop("stock")
+        line["quantity"] = random.randint(1, 5)
+        line["id"] = product_id
+        lines.append(line)
+
+    order.update(
+        {
+            "user": sub,
+            "products": lines,
+            "total": sum(line["price"] * line["quantity"] for line in lines),
+            "status": "pending",
+            "billingAddress": "86 Cypress St.Niceville, FL 32578",
+            "paymentMethod": "credit",
+            "dateCreated": now,
+            "dateModified": now,
+        }
+    )
+    return order
+
+
+@benchmark("serialization")
+def serialization():
+    """JSON responses of product listings and orders, per provider."""
+    payloads = {
+        "500 products": {
+            "products": [make_product(product_id) for product_id in range(1, 501)],
+            "totalItems": 500,
+        },
+        "100 orders x 20 lines": {
+            "orders": [make_order(order_id) for order_id in range(1, 101)],
+            "totalItems": 100,
+        },
+    }
+
+    app = Flask(__name__)
+    providers = {"flask default": DefaultJSONProvider(app)}
+    orjson = json_provider.orjson
+    json_provider.orjson = None
+    providers["fast, stdlib fallback"] = json_provider.FastJSONProvider(app)
+    if orjson is not None:
+        providers["fast, orjson"] = json_provider.FastJSONProvider(app)
+
+    rows = []
+    with app.app_context():
+        for payload_name, payload in payloads.items():
+            for provider_name, provider in providers.items():
+                json_provider.orjson = orjson if "orjson" in provider_name else None
+                seconds = measure(lambda: provider.response(payload))
+                size = len(provider.response(payload).get_data())
+                rows.append(
+                    (
+                        f"{payload_name}, {provider_name}",
+                        f"{seconds * 1000:8.2f} ms  {size / 1024:8.1f} KiB",
+                    )
+                )
+
+    json_provider.orjson = orjson
+    report("serialization", rows)
+
+
+@benchmark("analytics")
+def sales_analytics(lines=1_000_000):
+    """Sales rollups over 1M synthetic line items, columnar vs per line."""
+    rng = np.random.default_rng(0)
+    first_day = datetime.date(2026, 1, 1).toordinal()
+    days = rng.integers(first_day, first_day + 365, lines).tolist()
+    # Sales follow a long tail: a few products sell most of the units
+    product_ids = np.minimum(rng.zipf(1.3, lines), 5000).tolist()
+    quantities = rng.integers(1, 10, lines).tolist()
+    prices = rng.uniform(1, 500, lines).round(2).tolist()
+
+    def columnar(batch_size):
+        results = {}
+        for start in range(0, lines, batch_size):
+            batch = analytics.ColumnBatch()
+            batch.extend_columns(
+                days[start : start + batch_size],
+                product_ids[start : start + batch_size],
+                quantities[start : start + batch_size],
+                prices[start : start + batch_size],
+            )
+            batch.reduce(results)
+        return results
+
+    def per_line():
+        results = {}
+        for day, product_id, quantity, price in zip(
+            days, product_ids, quantities, prices
+        ):
+            sales = results.setdefault(day, analytics.empty_day())
+            product = sales["products"].setdefault(str(product_id), [0, 0.0])
+            product[0] += quantity
+            product[1] += quantity * price
+            sales["units"] += quantity
+        return results
+
+    rows = [
+        ("per-line dict loop", f"{measure(per_line, repeat=3):8.3f} s"),
+        (
+            f"columnar, {analytics.BATCH_SIZE}-row batches",
+            f"{measure(lambda: columnar(analytics.BATCH_SIZE), repeat=3):8.3f} s",
+        ),
+        (
+            "columnar, 1000-row batches",
+            f"{measure(lambda: columnar(1000), repeat=3):8.3f} s",
+        ),
+    ]
+    report(f"analytics ({lines} line items)", rows)
+
+
+@benchmark("datastore")
+def datastore_policy(reads=1000):
+    """Reads against a store with a slow tail and transient errors, per policy."""
+    store = fake_datastore.Client(project=PROJECT_ID)
+    product = make_product(1)
+    store.put(product)
+
+    # 2% of calls take 100 ms instead of 2 ms, 2% fail
+    rng = random.Random(0)
+    store.latency = lambda: 0.1 if rng.random() < 0.02 else 0.002
+    store.failure_rate = 0.02
+
+    clients = {
+        "no policy": store,
+        "retries": db.PolicyClient(store, hedge_reads=False),
+        "retries and hedged reads": db.PolicyClient(store, hedge_reads=True),
+    }
+
+    rows = []
+    for name, client in clients.items():
+        latencies = []
+        errors = 0
+        for _ in range(reads):
+            started = time.perf_counter()
+            try:
+                client.get(product.key)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+        # Leave out the reads the hedging policy needs to learn the p95
+        latencies = np.array(latencies[db.HEDGE_MIN_SAMPLES :]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        rows.append(
+            (
+                name,
+                f"p50 {p50:6.1f} ms  p95 {p95:6.1f} ms  p99 {p99:6.1f} ms  "
+                f"errors {errors}",
+            )
+        )
+
+    report(f"datastore ({reads} reads)", rows)
+
+
+@benchmark("streams")
+def stream_fanout(subscribers=10000, events_count=100):
+    """Memory of idle stream subscriptions and the cost of publishing to them."""
+    broker = events.LocalBroker(max_subscribers=subscribers)
+    product_ids = range(1, 101)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    subscriptions = [
+        broker.subscribe({random.choice(product_ids)}) for _ in range(subscribers)
+    ]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def publish():
+        for product_id in random.choices(product_ids, k=events_count):
+            broker.publish({"id": product_id, "stock": 1, "price": 1.0})
+
+    def drain():
+        for subscription in subscriptions:
+            while subscription.get(0) is not None:
+                pass
+
+    broker_wide = events.LocalBroker(max_subscribers=subscribers)
+    for _ in range(subscribers):
+        broker_wide.subscribe()
+
+    def publish_wide():
+        for _ in range(events_count):
+            broker_wide.publish({"id": 1, "stock": 1, "price": 1.0})
+
+    filtered = measure(publish)
+    drain()
+    unfiltered = measure(publish_wide, repeat=1)
+    rows = [
+        ("memory per subscription", f"{(after - before) / subscribers:8.0f} B"),
+        (
+            "publish, filtered by id",
+            f"{filtered / events_count * 1e6:8.1f} us/event",
+        ),
+        (
+            "publish, all subscribers",
+            f"{unfiltered / events_count * 1e6:8.1f} us/event",
+        ),
+    ]
+    report(f"streams ({subscribers} idle subscribers)", rows)
+
+
+@benchmark("memory")
+def handler_memory(products=100, orders=300, users=100, rounds=1):
+    """Peak and net allocations of the heaviest handlers, per route."""
+    import main
+    import memprofile
+
+    store = db.client.client
+    store.latency = 0.0
+    for product_id in range(1, products + 1):
+        store.put(make_product(product_id))
+
+    for order_id in range(1, orders + 1):
+        store.put(make_order(order_id))
+
+    for index in range(users):
+        entity = datastore.Entity(key=store.key(USERS, f"auth0|user{index}"))
+        entity.update(
+            {
+                "name": f"user{index}",
+                "email": f"user{index}@example.com",
+                "orders": [make_order(index * 10 + line, 3) for line in range(3)],
+            }
+        )
+        store.put(entity)
+
+    test_client = main.app.test_client()
+    headers = {"Accept": "application/json"}
+    memprofile.reset()
+    memprofile.set_sample_rate(1.0)
+    try:
+        for _ in range(rounds):
+            test_client.get("/users?limit=100", headers=headers)
+            test_client.get("/products?limit=100", headers=headers)
+            test_client.patch("/products/1", json={"price": 9.99}, headers=headers)
+    finally:
+        memprofile.set_sample_rate(0)
+
+    rows = []
+    for route, stats in memprofile.report()["routes"].items():
+        rows.append(
+            (
+                route,
+                f"peak {stats['peakMax'] / 1024:8.0f} KiB  "
+                f"net {stats['netMean'] / 1024:6.0f} KiB",
+            )
+        )
+        for site in stats["topSites"][:3]:
+            rows.append((f"  {site['site']}", f"{site['bytes'] / 1024:8.0f} KiB"))
+
+    report(f"memory ({orders} orders, {users} users)", rows)
+
+
+@benchmark("indexes")
+def index_writes(orders=200, index_latency=0.00002):
+    """Index rows per entity, and PATCH /products/<id> before and after the schema."""
+    import copy
+
+    import main
+    import schema
+
+    user = datastore.Entity(key=datastore.Key(USERS, "auth0|user", project=PROJECT_ID))
+    user.update(
+        {
+            "name": "user",
+            "email": "user@example.com",
+            "orders": [make_order(line, 3) for line in range(3)],
+        }
+    )
+    entities = {
+        "product": make_product(1),
+        "order, 20 lines": make_order(1),
+        "user, 3 orders": user,
+    }
+
+    rows = []
+    for label, entity in entities.items():
+        before = fake_datastore.index_entries(entity)
+        applied = copy.deepcopy(entity)
+        schema.apply(applied)
+        after = fake_datastore.index_entries(applied)
+        rows.append((label, f"{before:6} -> {after:4} index rows"))
+    report("indexes per entity", rows)
+
+    # Pending orders that all hold product 1, so the update rewrites each
+    store = db.client.client
+    store.latency = 0.0
+    store.index_latency = index_latency
+    store.put(make_product(1))
+    for order_id in range(1, orders + 1):
+        entity = make_order(order_id, products=5)
+        entity.key = store.key(USERS, "auth0|benchmark", ORDERS, order_id)
+        store.put(entity)
+
+    test_client = main.app.test_client()
+    headers = {"Accept": "application/json"}
+
+    def patch():
+        index_writes = store.index_writes
+        elapsed = measure(
+            lambda: test_client.patch(
+                "/products/1", json={"price": 9.99}, headers=headers
+            ),
+            repeat=3,
+        )
+        return elapsed, (store.index_writes - index_writes) // 3
+
+    indexed = schema.INDEXED
+    schema.INDEXED = {}
+    try:
+        before = patch()
+    finally:
+        schema.INDEXED = indexed
+
+    rows = []
+    for kind in sorted(schema.INDEXED):
+        scanned, rewritten = schema.migrate(kind)
+        rows.append((f"migrate {kind}", f"rewrote {rewritten} of {scanned}"))
+
+    after = patch()
+    for label, (elapsed, writes) in (("before", before), ("after", after)):
+        rows.append(
+            (f"PATCH /products/1, {label}", f"{elapsed * 1000:8.1f} ms  {writes} rows")
+        )
+    report(
+        f"indexes ({orders} pending orders, {index_latency * 1e6:.0f} us a row)", rows
+    )
+
+
+@benchmark("snapshot")
+def catalog_snapshot(products=10000, workers=4):
+    """Product reads and per-worker memory, Datastore and cache vs the snapshot."""
+    import multiprocessing
+    import tempfile
+
+    import catalog
+    import models
+    import snapshot
+
+    store = db.client.client
+    store.latency = 0.002
+    for product_id in range(1, products + 1):
+        product = make_product(product_id)
+        catalog.stamp(product)
+        store.put(product)
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    started = time.perf_counter()
+    snapshot.build(path)
+    build_time = time.perf_counter() - started
+    mapped = snapshot.Snapshot(path)
+    ids = random.sample(range(1, products + 1), 1000)
+
+    def per_read(func, count=len(ids)):
+        return f"{measure(func, repeat=3) / count * 1e6:10.1f} us"
+
+    catalog.cache.ttl = 3600
+    rows = [
+        (f"build, {products} products", f"{build_time:.2f} s"),
+        ("file size", f"{os.path.getsize(path) / 1024:.0f} KiB"),
+        (
+            "get, Datastore (2 ms)",
+            per_read(lambda: [store.get(store.key(PRODUCTS, i)) for i in ids[:50]], 50),
+        ),
+        ("get, process cache", per_read(lambda: [catalog.get_product(i) for i in ids])),
+        (
+            "get, snapshot",
+            per_read(lambda: [mapped.product(mapped.index(i)) for i in ids]),
+        ),
+        (
+            "page of 100, snapshot",
+            per_read(lambda: [mapped.product(i) for i in range(100)], 1),
+        ),
+    ]
+
+    def private_kib():
+        # Resident memory that no other process shares
+        with open("/proc/self/smaps_rollup") as file:
+            fields = dict(line.split(":", 1) for line in file if ":" in line)
+        return sum(
+            int(fields[name].split()[0]) for name in ("Private_Clean", "Private_Dirty")
+        )
+
+    def cache_worker(results):
+        before = private_kib()
+        cache = catalog.ProductCache(products, 3600)
+        # Products as a Datastore read returns them, without touching the
+        # objects of the parent, whose pages would be copied on write
+        for product_id in range(1, products + 1):
+            product = models.Product.from_entity(make_product(product_id))
+            cache.set(product_id, product)
+        results.put(private_kib() - before)
+
+    def snapshot_worker(results):
+        before = private_kib()
+        worker_snapshot = snapshot.Snapshot(path)
+        for index in range(len(worker_snapshot)):
+            worker_snapshot.product(index)
+        results.put(private_kib() - before)
+
+    if os.path.exists("/proc/self/smaps_rollup"):
+        store.latency = 0.0
+        context = multiprocessing.get_context("fork")
+        for label, target in (("cache", cache_worker), ("snapshot", snapshot_worker)):
+            results = context.Queue()
+            processes = [
+                context.Process(target=target, args=(results,)) for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            private = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            rows.append(
+                (
+                    f"private memory per worker, {label}",
+                    f"{sum(private) / len(private) / 1024:7.1f} MiB",
+                )
+            )
+
+    report(f"snapshot ({products} products, {workers} workers)", rows)
+
+
+@benchmark("models")
+def model_conversion(products=10000, orders=1000):
+    """Memory per cached product and conversion throughput, entities vs models."""
+    import copy
+
+    import models
+
+    entities = [make_product(product_id) for product_id in range(1, products + 1)]
+    for entity in entities:
+        entity["updatedAt"] = datetime.datetime.now(datetime.timezone.utc)
+
+    def cached_size(build):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            cache = build()
+            size = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        del cache
+        return size / products
+
+    # Both as read back from Datastore, so neither shares strings with entities
+    def read(entity):
+        return helpers.entity_from_protobuf(helpers.entity_to_protobuf(entity))
+
+    entity_size = cached_size(lambda: [read(entity) for entity in entities])
+    model_size = cached_size(
+        lambda: [models.Product.from_entity(read(entity)) for entity in entities]
+    )
+    product_models = [models.Product.from_entity(entity) for entity in entities]
+
+    def per_second(func, count):
+        return f"{count / measure(func, repeat=3):12,.0f} /s"
+
+    def entity_to_dict(entity):
+        # What the handlers did: copy the cached entity, then add id and self
+        product = copy.copy(entity)
+        product["id"] = entity.key.id
+        product["self"] = f"https://example.com/products/{entity.key.id}"
+        return product
+
+    order_entities = [make_order(order_id) for order_id in range(1, orders + 1)]
+    order_models = [models.Order.from_entity(order) for order in order_entities]
+    rows = [
+        ("bytes per cached product, entity", f"{entity_size:12,.0f}"),
+        ("bytes per cached product, model", f"{model_size:12,.0f}"),
+        (
+            "product from entity",
+            per_second(
+                lambda: [models.Product.from_entity(e) for e in entities], products
+            ),
+        ),
+        (
+            "product to entity",
+            per_second(lambda: [p.to_entity() for p in product_models], products),
+        ),
+        (
+            "product response, entity copy",
+            per_second(lambda: [entity_to_dict(e) for e in entities], products),
+        ),
+        (
+            "product response, model",
+            per_second(
+                lambda: [
+                    p.to_dict(f"https://example.com/products/{p.id}")
+                    for p in product_models
+                ],
+                products,
+            ),
+        ),
+        (
+            "order (20 lines) from entity",
+            per_second(
+                lambda: [models.Order.from_entity(o) for o in order_entities], orders
+            ),
+        ),
+        (
+            "order (20 lines) to entity",
+            per_second(lambda: [o.to_entity() for o in order_models], orders),
+        ),
+    ]
+    report(f"models ({products} products, {orders} orders)", rows)
+
+
+@benchmark("asgi")
+def asgi_throughput(threads=8, concurrency=64, duration=5.0):
+    """GET /orders per second on one instance, Flask threads vs ASGI."""
+    import asyncio
+    import threading
+
+    import httpx
+    import verifyJWT
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk, jwt
+
+    import asgi
+    import main
+    import ratelimit
+
+    # Measure the handlers, not the limiter
+    ratelimit.RATE_LIMITS = {}
+    # Tokens are signed here, for whichever Auth0 tenant is configured
+    audience = verifyJWT.AUTH0_CLIENT_ID = verifyJWT.AUTH0_CLIENT_ID or "benchmark"
+    domain = verifyJWT.AUTH0_DOMAIN = verifyJWT.AUTH0_DOMAIN or "benchmark.auth0.com"
+
+    # Datastore takes 5 ms a call and Auth0 20 ms to return the signing keys
+    store = db.client.client
+    store.latency = 0.005
+    auth0_latency = 0.02
+
+    sub = "auth0|benchmark"
+    for order_id in range(1, 51):
+        entity = make_order(order_id, sub=sub)
+        entity.key = store.key(USERS, sub, ORDERS, order_id)
+        store.put(entity)
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    signing_key = jwk.construct(private_key, "RS256")
+    public_key = signing_key.public_key().to_dict()
+    public_key.update({"kid": "benchmark", "use": "sig"})
+    jwks = {"keys": [public_key]}
+    token = jwt.encode(
+        {
+            "sub": sub,
+            "aud": audience,
+            "iss": f"https://{domain}/",
+            "exp": int(time.time()) + 3600,
+        },
+        signing_key.to_dict(),
+        algorithm="RS256",
+        headers={"kid": "benchmark"},
+    )
+    headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+
+    def get_jwks(url):
+        time.sleep(auth0_latency)
+        return jwks
+
+    async def get_jwks_async(request):
+        await asyncio.sleep(auth0_latency)
+        return httpx.Response(200, json=jwks)
+
+    verifyJWT.http_client.get_json = get_jwks
+    asgi.http_transport = httpx.MockTransport(get_jwks_async)
+    asgi.executor = asgi.ThreadPoolExecutor(max_workers=threads)
+
+    # Flask: one request at a time on each thread, as in a threaded worker
+    flask_counts = [0] * threads
+    errors = {"flask": 0, "asgi": 0}
+    deadline = time.perf_counter() + duration
+
+    def flask_worker(index):
+        test_client = main.app.test_client()
+        while time.perf_counter() < deadline:
+            if test_client.get("/orders", headers=headers).status_code != 200:
+                errors["flask"] += 1
+            flask_counts[index] += 1
+
+    workers = [
+        threading.Thread(target=flask_worker, args=(index,)) for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # ASGI: many requests in flight, blocking calls on as many threads
+    async def asgi_load():
+        count = 0
+
+        async def asgi_worker(http):
+            nonlocal count
+            while time.perf_counter() < deadline:
+                response = await http.get("/orders", headers=headers)
+                if response.status_code != 200:
+                    errors["asgi"] += 1
+                count += 1
+
+        async with asgi.lifespan(asgi.app):
+            transport = httpx.ASGITransport(app=asgi.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://localhost"
+            ) as http:
+                await asyncio.gather(*(asgi_worker(http) for _ in range(concurrency)))
+        return count
+
+    deadline = time.perf_counter() + duration
+    asgi_count = asyncio.run(asgi_load())
+
+    rows = [
+        (
+            f"flask, {threads} threads",
+            f"{sum(flask_counts) / duration:7.1f} req/s  errors {errors['flask']}",
+        ),
+        (
+            f"asgi, {concurrency} in flight on {threads} threads",
+            f"{asgi_count / duration:7.1f} req/s  errors {errors['asgi']}",
+        ),
+    ]
+    report("asgi (GET /orders, 5 ms Datastore calls, 20 ms Auth0)", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks")
+    parser.add_argument(
+        "names", nargs="*", help=f"benchmarks to run, from {', '.join(BENCHMARKS)}"
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Read path and write notifications for products
+# Usage: python catalog.py backfill [--batch-size N]
+"""
+
+import argparse
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import constants
+import db
+import metrics
+import models
+import shared_store
+import singleflight
+from google.cloud import datastore
+from google.cloud.datastore import helpers
+from google.cloud.datastore_v1.types import entity as entity_pb2
+
+PROJECT_ID = constants.project_id
+PRODUCTS = constants.products
+PRODUCT_TOMBSTONES = constants.product_tombstones
+CACHE_TTL = constants.product_cache_ttl
+CACHE_SIZE = constants.product_cache_size
+PAGE_CACHE_SIZE = constants.page_cache_size
+PAGE_CACHE_TTL = constants.page_cache_ttl
+TOMBSTONE_TTL = constants.tombstone_ttl
+SETTLE_TIME = constants.changes_settle_time
+
+BACKFILL_BATCH_SIZE = 500
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+client = db.client
+
+
+class ProductCache:
+    """
+    A thread-safe LRU of product models that expire after a few seconds.
+    Writes in this process invalidate their products right away; the TTL
+    bounds how stale a product written by another instance can be.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id):
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is None:
+                return None
+
+            product, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[product_id]
+                return None
+
+            self._entries.move_to_end(product_id)
+            return product
+
+    def set(self, product_id, product):
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[product_id] = (product, time.monotonic() + self.ttl)
+            self._entries.move_to_end(product_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                self._entries.pop(product_id, None)
+
+
+cache = ProductCache(CACHE_SIZE, CACHE_TTL)
+
+
+class LocalPageStore:
+    """
+    Listing pages and the catalog generation, in this process. Pages are
+    keyed by generation, so bumping it invalidates every page at once and
+    the LRU evicts the pages of old generations.
+    """
+
+    def __init__(self, maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._generation = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def bump(self):
+        with self._lock:
+            self._generation += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+
+            page, expires = entry
+            if expires <= time.monotonic():
+                del self._pages[key]
+                return None
+
+            self._pages.move_to_end(key)
+            return page
+
+    def set(self, key, page):
+        with self._lock:
+            self._pages[key] = (page, time.monotonic() + self.ttl)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+
+    def __len__(self):
+        return len(self._pages)
+
+
+class RedisPageStore:
+    """
+    Listing pages and the catalog generation shared by every instance
+    through Redis. Products are stored as Datastore protobufs and pages
+    expire after the TTL, which bounds the memory of old generations.
+    """
+
+    GENERATION_KEY = "catalog:generation"
+
+    def __init__(self, redis, ttl=PAGE_CACHE_TTL):
+        self.redis = redis
+        self.ttl = ttl
+
+    def generation(self):
+        return int(self.redis.get(self.GENERATION_KEY) or 0)
+
+    def bump(self):
+        self.redis.incr(self.GENERATION_KEY)
+
+    def _key(self, key):
+        return "catalog:page:" + ":".join(str(part) for part in key)
+
+    def get(self, key):
+        data = self.redis.hgetall(self._key(key))
+        if not data:
+            return None
+
+        products = [
+            models.Product.from_entity(
+                helpers.entity_from_protobuf(entity_pb2.Entity.deserialize(data[field]))
+            )
+            for field in sorted((field for field in data if field.isdigit()), key=int)
+        ]
+        return products, int(data[b"total"]), data[b"more"] == b"1"
+
+    def set(self, key, page):
+        products, total_items, more = page
+        mapping = {
+            str(index): entity_pb2.Entity.serialize(
+                helpers.entity_to_protobuf(product.to_entity())
+            )
+            for index, product in enumerate(products)
+        }
+        mapping.update({"total": total_items, "more": int(more)})
+
+        pipeline = self.redis.pipeline()
+        pipeline.hset(self._key(key), mapping=mapping)
+        pipeline.expire(self._key(key), self.ttl)
+        pipeline.execute()
+
+
+_page_store = None
+
+
+def get_page_store():
+    global _page_store
+
+    if _page_store is None:
+        redis = shared_store.get_redis()
+        _page_store = RedisPageStore(redis) if redis else LocalPageStore()
+
+    return _page_store
+
+
+def page_stats():
+    store = get_page_store()
+    hits = metrics.counter("catalog.pages.hits")
+    misses = metrics.counter("catalog.pages.misses")
+    return {
+        "generation": store.generation(),
+        "size": len(store) if isinstance(store, LocalPageStore) else None,
+        "hitRatio": round(hits / (hits + misses), 3) if hits + misses else 0,
+    }
+
+
+# Concurrent reads of the same product or page share one Datastore call
+product_flights = singleflight.Group("products")
+page_flights = singleflight.Group("product_pages")
+
+
+# Functions called with (written products, deleted product ids) after writes
+_listeners = []
+
+
+def on_change(listener):
+    """Registers a listener for product writes; usable as a decorator."""
+    _listeners.append(listener)
+    return listener
+
+
+def notify(*products, deleted=()):
+    """
+    Must be called after products are written or deleted, with the entities
+    as written, so that caches and derived views stay up to date.
+    """
+    cache.invalidate([product.key.id for product in products])
+    cache.invalidate(deleted)
+    get_page_store().bump()
+    for listener in _listeners:
+        listener(products, deleted)
+
+
+_last_version = 0
+_version_lock = threading.Lock()
+
+
+def next_version():
+    """
+    Microseconds since the epoch, strictly increasing in this process so
+    that no two products written here share a version.
+    """
+    global _last_version
+
+    with _version_lock:
+        _last_version = max(int(time.time() * 1_000_000), _last_version + 1)
+        return _last_version
+
+
+def version_time(version):
+    return EPOCH + datetime.timedelta(microseconds=version)
+
+
+def time_version(value):
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def stamp(*products):
+    """
+    Sets updatedAt on products about to be written. Call it right before
+    the put or the end of the transaction that commits them: changes are
+    only listed once they are older than a commit can take.
+    """
+    for product in products:
+        product["updatedAt"] = version_time(next_version())
+
+
+def tombstone(product_id):
+    """Returns the entity recording that a product was deleted."""
+    entity = datastore.Entity(key=client.key(PRODUCT_TOMBSTONES, product_id))
+    updated_at = version_time(next_version())
+    entity.update(
+        {
+            "updatedAt": updated_at,
+            "expiresAt": updated_at + datetime.timedelta(seconds=TOMBSTONE_TTL),
+        }
+    )
+    return entity
+
+
+def backfill(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Stamps the products written before updatedAt was introduced, so that
+    they are listed by changes_since and served from catalog snapshots.
+    Each batch is read and written in a transaction, and products already
+    stamped are left alone, so the backfill can be run again after an
+    interruption. Returns the numbers of products scanned and stamped.
+    """
+    query = client.query(kind=PRODUCTS)
+    query.keys_only()
+
+    scanned = 0
+    stamped = 0
+    keys = []
+
+    def stamp_batch(keys):
+        with client.transaction():
+            unstamped = [
+                product
+                for product in client.get_multi(keys)
+                if product.get("updatedAt") is None
+            ]
+            if unstamped:
+                stamp(*unstamped)
+                client.put_multi(unstamped)
+
+        if unstamped:
+            notify(*unstamped)
+        return len(unstamped)
+
+    for entity in query.fetch():
+        keys.append(entity.key)
+        scanned += 1
+        if len(keys) >= batch_size:
+            stamped += stamp_batch(keys)
+            keys = []
+
+    if keys:
+        stamped += stamp_batch(keys)
+
+    return scanned, stamped
+
+
+def changes_since(since, limit):
+    """
+    Returns the ids of the products changed and deleted after since, a
+    (version, product id) position, as (changed, deleted, position of the
+    last change, whether more changes follow).
+    """
+    horizon = version_time(next_version() - SETTLE_TIME * 1_000_000)
+
+    rows = []
+    for kind in (PRODUCTS, PRODUCT_TOMBSTONES):
+        query = client.query(kind=kind)
+        query.add_filter("updatedAt", ">=", version_time(since[0]))
+        query.add_filter("updatedAt", "<=", horizon)
+        query.order = ["updatedAt"]
+        query.projection = ["updatedAt"]
+        for entity in query.fetch(limit=limit + 1):
+            position = (time_version(entity["updatedAt"]), entity.key.id)
+            if position > since:
+                rows.append((position, kind))
+
+    rows.sort()
+    changed = [position[1] for position, kind in rows[:limit] if kind == PRODUCTS]
+    deleted = [position[1] for position, kind in rows[:limit] if kind != PRODUCTS]
+    last = rows[:limit][-1][0] if rows else since
+    return changed, deleted, last, len(rows) > limit
+
+
+def get_products(product_ids):
+    """
+    Returns a dict of product id to the product model for the ids that
+    exist. Ids missing from the cache are fetched with one get_multi.
+    """
+    products = {}
+    misses = []
+    for product_id in product_ids:
+        product = cache.get(product_id)
+        if product is None:
+            misses.append(product_id)
+        else:
+            products[product_id] = product
+
+    if misses:
+        for entity in client.get_multi(
+            [client.key(PRODUCTS, product_id) for product_id in misses]
+        ):
+            product = models.Product.from_entity(entity)
+            cache.set(product.id, product)
+            products[product.id] = product
+
+    return products
+
+
+def _fetch_product(product_id):
+    entity = client.get(client.key(PRODUCTS, product_id))
+    if entity is None:
+        return None
+
+    product = models.Product.from_entity(entity)
+    cache.set(product_id, product)
+    return product
+
+
+def get_product(product_id):
+    """Returns the product model, or None if it does not exist."""
+    product = cache.get(product_id)
+    if product is None:
+        product = product_flights.do(product_id, lambda: _fetch_product(product_id))
+
+    return product
+
+
+def _fetch_page(limit, offset):
+    started = time.perf_counter()
+
+    count_query = client.query(kind=PRODUCTS)
+    count_query.keys_only()
+    total_items = sum(1 for _ in count_query.fetch())
+
+    page = client.query(kind=PRODUCTS).fetch(limit=limit, offset=offset)
+    products = [models.Product.from_entity(entity) for entity in page]
+
+    metrics.observe("catalog.pages.build", time.perf_counter() - started)
+    return products, total_items, bool(page.next_page_token)
+
+
+def _build_page(key, limit, offset):
+    page = _fetch_page(limit, offset)
+    get_page_store().set(key, page)
+    return page
+
+
+def list_products(limit, offset):
+    """
+    Returns a page of products as a list of models, the total number
+    of products and whether more products follow the page. Pages are cached
+    until the next product write bumps the catalog generation.
+    """
+    store = get_page_store()
+    # Read the generation before the page, so a page built while a write
+    # happens is stored under the old generation and never served
+    key = (store.generation(), limit, offset)
+    page = store.get(key)
+    if page is None:
+        metrics.incr("catalog.pages.misses")
+        page = page_flights.do(key, lambda: _build_page(key, limit, offset))
+    else:
+        metrics.incr("catalog.pages.hits")
+
+    products, total_items, more = page
+    return list(products), total_items, more
+
+
+metrics.register_collector("product_pages", page_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the product catalog")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        scanned, stamped = backfill(args.batch_size)
+        print(f"Stamped {stamped} of {scanned} products")
+
+
+if __name__ == "__main__":
+    main()
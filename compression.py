@@ -0,0 +1,96 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Negotiated gzip and brotli compression of responses
+"""
+
+import gzip
+import zlib
+
+import constants
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = constants.compression_min_size
+GZIP_LEVEL = constants.compression_level
+BROTLI_QUALITY = constants.brotli_quality
+
+# Event streams are left alone so that every event reaches the client as is
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/plain",
+}
+
+
+def _encodings():
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _compress_stream(chunks, encoding):
+    """Compresses a generator response, flushing after every chunk."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def compress_response(response):
+    """Compresses the response if the client accepts it and it is worth it."""
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "Content-Encoding" in response.headers
+        or response.direct_passthrough
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(_encodings())
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        # Small bodies are sent as is, they are not worth the CPU
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(_compress(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
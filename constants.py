@@ -3,3 +3,75 @@ users = "users"
 orders = "orders"
 products = "products"
 limit = 5
+idempotency_keys = "idempotency_keys"
+idempotency_ttl = 24 * 60 * 60
+idempotency_cache_size = 1024
+idempotency_wait_timeout = 30
+# Token bucket per route (blueprint): tokens per second, burst size
+rate_limits = {
+    "order": (5, 20),
+    "product": (20, 60),
+    "user": (5, 20),
+}
+max_in_flight = 64
+product_cache_ttl = 5
+product_cache_size = 10000
+http_connect_timeout = 3.05
+http_read_timeout = 10
+http_pool_size = 20
+http_max_retries = 2
+http_backoff = 0.2
+circuit_failure_threshold = 5
+circuit_reset_timeout = 30
+compression_min_size = 1024
+compression_level = 6
+brotli_quality = 5
+sales_rollups = "sales_rollups"
+analytics_batch_size = 50000
+analytics_max_days = 366
+inventory = "inventory"
+low_stock_threshold = 10
+# Pending orders not modified for this many seconds are canceled
+pending_order_ttl = 48 * 60 * 60
+sweep_limit = 5000
+sweep_interval = 15 * 60
+page_cache_size = 1000
+page_cache_ttl = 60
+# Seconds a request may spend on Datastore calls, and each call at most
+request_deadline = 30
+task_deadline = 9 * 60
+# Batches of POST /orders:transition written at once
+transition_workers = 4
+datastore_call_timeout = 10
+datastore_read_retries = 2
+datastore_backoff = 0.1
+datastore_hedge_reads = True
+datastore_hedge_percentile = 0.95
+datastore_hedge_min_delay = 0.02
+capture_sample_rate = 0.01
+capture_max_body_size = 64 * 1024
+capture_queue_size = 10000
+product_tombstones = "product_tombstones"
+tombstone_ttl = 30 * 24 * 60 * 60
+# Changes are listed once they are this many seconds old, so that writes
+# still in flight on other instances are not skipped. Products are stamped
+# right before the call that commits them, which times out after
+# datastore_call_timeout; the rest covers clock skew between instances
+changes_settle_time = datastore_call_timeout + 5
+changes_limit = 100
+subscriber_queue_size = 100
+max_subscribers = 10000
+stream_heartbeat = 15
+known_users_size = 100000
+asgi_workers = 32
+memory_trace_frames = 30
+memory_top_sites = 10
+# Stack samples are taken this many seconds apart, for at most a max profile
+profile_interval = 0.01
+profile_max_seconds = 30
+profile_max_depth = 100
+# Workers check the catalog snapshot for changes this often, and rebuild it
+# when it changed and is at least min age seconds old, or is max age old
+snapshot_check_interval = 1
+snapshot_min_age = 30
+snapshot_max_age = 10 * 60
@@ -0,0 +1,263 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Datastore client shared by the app, with deadlines, retries and hedged reads
+"""
+
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from os import environ as env
+
+import constants
+import metrics
+import schema
+import timing
+from dotenv import find_dotenv, load_dotenv
+from flask import g, has_request_context, jsonify
+from google.api_core import exceptions
+from google.cloud import datastore
+
+ENV_FILE = find_dotenv()
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
+
+PROJECT_ID = constants.project_id
+REQUEST_DEADLINE = constants.request_deadline
+CALL_TIMEOUT = constants.datastore_call_timeout
+READ_RETRIES = constants.datastore_read_retries
+BACKOFF = constants.datastore_backoff
+HEDGE_READS = constants.datastore_hedge_reads
+HEDGE_PERCENTILE = constants.datastore_hedge_percentile
+HEDGE_MIN_DELAY = constants.datastore_hedge_min_delay
+
+# "memory" runs the app on the in-process fake instead of Datastore
+BACKEND = env.get("DATASTORE_BACKEND", "datastore")
+
+# Errors after which a read may succeed if sent again
+RETRYABLE_ERRORS = (
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ServiceUnavailable,
+    exceptions.TooManyRequests,
+)
+
+# Reads are only hedged once their timer has this many samples
+HEDGE_MIN_SAMPLES = 100
+# How often the hedge delay is recomputed from the timer, in seconds
+HEDGE_REFRESH = 1.0
+
+# The deadline of a request served outside Flask, by the ASGI app; calls
+# sent to other threads must run in a copy of the caller's context
+deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DatastoreUnavailable(Exception):
+    """A Datastore call failed after its retries or ran out of time."""
+
+
+def remaining():
+    """Seconds left before the deadline of the current request, or None."""
+    if has_request_context() and "deadline" in g:
+        return g.deadline - time.monotonic()
+    if deadline.get() is not None:
+        return deadline.get() - time.monotonic()
+    return None
+
+
+def set_deadline(seconds):
+    """Gives the current request seconds from now, for long-running endpoints."""
+    g.deadline = time.monotonic() + seconds
+
+
+def call_timeout():
+    """
+    The timeout of the next call: the per-call timeout, cut down to what is
+    left of the request deadline.
+    """
+    left = remaining()
+    if left is None:
+        return CALL_TIMEOUT
+    if left <= 0:
+        metrics.incr("datastore.deadline_exceeded")
+        raise DatastoreUnavailable("The request ran out of time")
+    return min(CALL_TIMEOUT, left)
+
+
+class PolicyClient:
+    """
+    Wraps a Datastore client so that every call gets a timeout from the
+    request deadline. Reads outside transactions are retried with backoff
+    and, when they take longer than usual, hedged with a second identical
+    read. Writes are never retried or hedged, and get the indexed properties
+    of the schema. Anything the wrapper does not define goes to the wrapped
+    client.
+    """
+
+    def __init__(self, client, hedge_reads=HEDGE_READS, hedge_workers=16):
+        self.client = client
+        self.hedge_reads = hedge_reads
+        self._executor = ThreadPoolExecutor(
+            max_workers=hedge_workers, thread_name_prefix="datastore-hedge"
+        )
+        self._hedge_delays = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _hedge_delay(self, name):
+        """The recent p95 latency of a read, or None while it is unknown."""
+        now = time.monotonic()
+        with self._lock:
+            delay, refreshed = self._hedge_delays.get(name, (None, 0.0))
+            if now - refreshed < HEDGE_REFRESH:
+                return delay
+
+        delay = None
+        if metrics.timer_count(f"datastore.{name}") >= HEDGE_MIN_SAMPLES:
+            delay = max(
+                metrics.percentile(f"datastore.{name}", HEDGE_PERCENTILE),
+                HEDGE_MIN_DELAY,
+            )
+
+        with self._lock:
+            self._hedge_delays[name] = (delay, now)
+        return delay
+
+    def _hedged(self, name, call, timeout):
+        delay = self._hedge_delay(name)
+        if delay is None or delay >= timeout:
+            return call(timeout)
+
+        first = self._executor.submit(call, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        metrics.incr(f"datastore.{name}.hedged")
+        second = self._executor.submit(call, timeout - delay)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        metrics.incr(f"datastore.{name}.hedge_won")
+                    return future.result()
+
+        # Both reads failed; report the one sent first
+        return first.result()
+
+    def _read(self, name, *args, **kwargs):
+        with timing.phase("datastore"):
+            return self._read_with_retries(name, *args, **kwargs)
+
+    def _read_with_retries(self, name, *args, **kwargs):
+        call = getattr(self.client, name)
+        in_transaction = self.client.current_transaction is not None
+
+        def timed(timeout):
+            started = time.perf_counter()
+            result = call(*args, timeout=timeout, **kwargs)
+            metrics.observe(f"datastore.{name}", time.perf_counter() - started)
+            return result
+
+        for attempt in range(READ_RETRIES + 1):
+            timeout = call_timeout()
+            try:
+                if self.hedge_reads and not in_transaction:
+                    return self._hedged(name, timed, timeout)
+                return timed(timeout)
+            except RETRYABLE_ERRORS as e:
+                metrics.incr(f"datastore.{name}.errors")
+                # A transaction is retried as a whole by its caller, if at all
+                if in_transaction or attempt == READ_RETRIES:
+                    raise DatastoreUnavailable(str(e)) from e
+
+                # Full jitter, capped by what is left of the deadline
+                pause = random.uniform(0, BACKOFF * 2**attempt)
+                left = remaining()
+                if left is not None and pause >= left:
+                    raise DatastoreUnavailable(str(e)) from e
+                metrics.incr(f"datastore.{name}.retries")
+                time.sleep(pause)
+
+    def _write(self, name, *args, **kwargs):
+        try:
+            with timing.phase("datastore"):
+                return getattr(self.client, name)(
+                    *args, timeout=call_timeout(), **kwargs
+                )
+        except RETRYABLE_ERRORS as e:
+            metrics.incr(f"datastore.{name}.errors")
+            raise DatastoreUnavailable(str(e)) from e
+
+    def get(self, key, **kwargs):
+        return self._read("get", key, **kwargs)
+
+    def get_multi(self, keys, **kwargs):
+        return self._read("get_multi", keys, **kwargs)
+
+    def put(self, entity, **kwargs):
+        schema.apply(entity)
+        return self._write("put", entity, **kwargs)
+
+    def put_multi(self, entities, **kwargs):
+        schema.apply(*entities)
+        return self._write("put_multi", entities, **kwargs)
+
+    def delete(self, key, **kwargs):
+        return self._write("delete", key, **kwargs)
+
+    def delete_multi(self, keys, **kwargs):
+        return self._write("delete_multi", keys, **kwargs)
+
+    def query(self, **kwargs):
+        """Queries fetch with a timeout from the request deadline."""
+        query = self.client.query(**kwargs)
+        fetch = query.fetch
+
+        def fetch_with_timeout(*args, **fetch_kwargs):
+            fetch_kwargs.setdefault("timeout", call_timeout())
+            with timing.phase("datastore"):
+                iterator = fetch(*args, **fetch_kwargs)
+
+            # The Datastore client fetches the pages as the results are read
+            if hasattr(iterator, "_next_page"):
+                iterator._next_page = timing.timed("datastore", iterator._next_page)
+            return iterator
+
+        query.fetch = fetch_with_timeout
+        return query
+
+
+def make_client():
+    if BACKEND == "memory":
+        import fake_datastore
+
+        return PolicyClient(fake_datastore.Client(project=PROJECT_ID))
+
+    return PolicyClient(datastore.Client(project=PROJECT_ID))
+
+
+client = make_client()
+
+
+def _start_deadline():
+    set_deadline(REQUEST_DEADLINE)
+
+
+def _unavailable(e):
+    response = jsonify({"Error": "The database is unavailable, try again later"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def init_app(app):
+    app.before_request(_start_deadline)
+    app.register_error_handler(DatastoreUnavailable, _unavailable)
@@ -0,0 +1,72 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Handles debug endpoints for instance instrumentation
+"""
+
+import constants
+import memprofile
+import metrics
+import profiler
+from flask import Blueprint, jsonify, request
+from verifyJWT import AuthError, verify_admin
+
+PROFILE_MAX_SECONDS = constants.profile_max_seconds
+
+bp = Blueprint("debug", __name__, url_prefix="/debug")
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics_get():
+    """
+    Return the counters, gauges and timers of this instance
+    """
+    try:
+        verify_admin(request)
+    except AuthError as e:
+        return jsonify(e.error), e.status_code
+
+    return jsonify(metrics.snapshot()), 200
+
+
+@bp.route("/memory", methods=["GET"])
+def memory_get():
+    """
+    Return the peak and net allocations of the sampled requests per route
+    """
+    try:
+        verify_admin(request)
+    except AuthError as e:
+        return jsonify(e.error), e.status_code
+
+    return jsonify(memprofile.report()), 200
+
+
+@bp.route("/profile", methods=["GET"])
+def profile_get():
+    """
+    Sample the stacks of all threads for the given seconds and return them
+    collapsed, one per line, for flamegraph.pl or speedscope
+    """
+    try:
+        verify_admin(request)
+    except AuthError as e:
+        return jsonify(e.error), e.status_code
+
+    try:
+        seconds = float(request.args.get("seconds", "10"))
+    except ValueError:
+        seconds = 0
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return (
+            jsonify({"Error": f"seconds must be between 0 and {PROFILE_MAX_SECONDS}"}),
+            400,
+        )
+
+    stacks = profiler.profile(seconds)
+    if stacks is None:
+        return jsonify({"Error": "A profile is already running"}), 409
+
+    return stacks, 200, {"Content-Type": "text/plain; charset=utf-8"}
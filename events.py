@@ -0,0 +1,202 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Publishes product stock and price changes to stream subscribers
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+
+import catalog
+import constants
+import metrics
+import shared_store
+
+QUEUE_SIZE = constants.subscriber_queue_size
+MAX_SUBSCRIBERS = constants.max_subscribers
+
+CHANNEL = "catalog:events"
+
+
+class Subscription:
+    """
+    The events for one stream, in a bounded queue. A subscriber that falls
+    behind loses its oldest events rather than holding up the publisher.
+    """
+
+    def __init__(self, product_ids=None, maxsize=QUEUE_SIZE):
+        self.product_ids = product_ids
+        self.dropped = 0
+        self._events = deque(maxlen=maxsize)
+        self._ready = threading.Condition()
+
+    def put(self, event):
+        with self._ready:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+                metrics.incr("events.dropped")
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout):
+        """Returns the next event, or None if none came within timeout."""
+        with self._ready:
+            if not self._events:
+                self._ready.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+
+class AsyncSubscription(Subscription):
+    """
+    A subscription read by a coroutine. Events are kept in the same bounded
+    queue, and the publishing thread wakes the event loop instead of a
+    thread, so an open stream holds no thread.
+    """
+
+    def __init__(self, loop, product_ids=None, maxsize=QUEUE_SIZE):
+        super().__init__(product_ids, maxsize)
+        self._loop = loop
+        self._waiter = asyncio.Event()
+
+    def put(self, event):
+        super().put(event)
+        self._loop.call_soon_threadsafe(self._waiter.set)
+
+    def _pop(self):
+        with self._ready:
+            if self._events:
+                return self._events.popleft()
+            # Cleared under the lock, so a later put sets it again
+            self._waiter.clear()
+            return None
+
+    async def get_async(self, timeout):
+        """Returns the next event, or None if none came within timeout."""
+        event = self._pop()
+        if event is not None:
+            return event
+
+        try:
+            await asyncio.wait_for(self._waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._pop()
+
+
+class LocalBroker:
+    """Delivers events to the subscriptions of this process."""
+
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._by_product = {}
+        self._all = set()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, product_ids=None, loop=None):
+        """
+        Returns a new subscription, or None when there are too many. Given
+        an event loop, the subscription is read with get_async on it.
+        """
+        if loop is None:
+            subscription = Subscription(product_ids)
+        else:
+            subscription = AsyncSubscription(loop, product_ids)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+
+            self._count += 1
+            if product_ids is None:
+                self._all.add(subscription)
+            for product_id in product_ids or ():
+                self._by_product.setdefault(product_id, set()).add(subscription)
+
+        metrics.gauge("events.subscribers", self._count)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._count -= 1
+            self._all.discard(subscription)
+            for product_id in subscription.product_ids or ():
+                subscribers = self._by_product.get(product_id)
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_product[product_id]
+
+        metrics.gauge("events.subscribers", self._count)
+
+    def deliver(self, event):
+        with self._lock:
+            subscribers = self._all | self._by_product.get(event["id"], set())
+
+        for subscription in subscribers:
+            subscription.put(event)
+        metrics.incr("events.delivered", len(subscribers))
+
+    def publish(self, event):
+        self.deliver(event)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Fans events out to every instance through a Redis channel. Each instance
+    runs one listener thread that delivers what it receives to its own
+    subscriptions, so events published here come back through Redis too.
+    """
+
+    def __init__(self, redis, max_subscribers=MAX_SUBSCRIBERS):
+        super().__init__(max_subscribers)
+        self.redis = redis
+        self._pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{CHANNEL: self._receive})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _receive(self, message):
+        self.deliver(json.loads(message["data"]))
+
+    def publish(self, event):
+        self.redis.publish(CHANNEL, json.dumps(event))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                redis = shared_store.get_redis()
+                _broker = RedisBroker(redis) if redis else LocalBroker()
+
+    return _broker
+
+
+@catalog.on_change
+def publish_changes(products, deleted):
+    """
+    Publishes the stock and price of the products written, and deletions.
+    Every write is published, even one that left them as they were: with
+    several instances, only the entity before the write could tell, and the
+    listener is not given it.
+    """
+    broker = get_broker()
+    for product in products:
+        broker.publish(
+            {
+                "id": product.key.id,
+                "stock": product.get("stock"),
+                "price": product.get("price"),
+            }
+        )
+
+    for product_id in deleted:
+        broker.publish({"id": product_id, "deleted": True})
@@ -0,0 +1,270 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: In-memory stand-in for the Datastore client, for local runs and benchmarks
+"""
+
+import copy
+import datetime
+import itertools
+import random
+import threading
+import time
+
+from google.api_core import exceptions
+from google.cloud import datastore
+
+OPERATORS = {
+    "=": lambda value, target: value == target,
+    "!=": lambda value, target: value != target,
+    "<": lambda value, target: value < target,
+    "<=": lambda value, target: value <= target,
+    ">": lambda value, target: value > target,
+    ">=": lambda value, target: value >= target,
+    "IN": lambda value, target: value in target,
+}
+
+
+def _utc(value):
+    """Datastore stores naive datetimes as UTC and returns them aware."""
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def index_entries(entity):
+    """
+    The rows an entity has in the built-in indexes: one ascending and one
+    descending per indexed value, counting each value of a list and each
+    indexed property of an embedded entity.
+    """
+    count = 0
+    excluded = getattr(entity, "exclude_from_indexes", ())
+    for name, value in entity.items():
+        if name in excluded:
+            continue
+
+        for item in value if isinstance(value, list) else [value]:
+            count += index_entries(item) if isinstance(item, dict) else 2
+
+    return count
+
+
+def _sort_key(value):
+    # None sorts first, like in Datastore, and values of one type compare
+    return (value is not None, value)
+
+
+class Transaction:
+    """
+    Serializes transactions of the client and restores the data written by
+    a transaction that raises.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._saved = None
+
+    def __enter__(self):
+        self.client._lock.acquire()
+        self._saved = dict(self.client._data)
+        self.client._local.transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.client._local.transaction = None
+        if exc_type is not None:
+            self.client._data = self._saved
+        self.client._lock.release()
+
+
+class Iterator:
+    def __init__(self, entities, next_page_token):
+        self.entities = entities
+        self.next_page_token = next_page_token
+        self.pages = iter([iter(entities)])
+
+    def __iter__(self):
+        return iter(self.entities)
+
+
+class Query:
+    def __init__(self, client, kind=None, ancestor=None):
+        self.client = client
+        self.kind = kind
+        self.ancestor = ancestor
+        self.filters = []
+        self.order = []
+        self._keys_only = False
+
+    def add_filter(self, property_name, operator, value):
+        self.filters.append((property_name, operator, _utc(value)))
+        return self
+
+    def keys_only(self):
+        self._keys_only = True
+
+    def _matches(self, entity):
+        key = entity.key
+        if self.kind and key.kind != self.kind:
+            return False
+
+        if self.ancestor is not None:
+            path = self.ancestor.flat_path
+            if key.flat_path[: len(path)] != path:
+                return False
+
+        for property_name, operator, target in self.filters:
+            if property_name == "__key__":
+                if not OPERATORS[operator](key.flat_path, target.flat_path):
+                    return False
+                continue
+
+            # Unindexed properties are invisible to queries
+            if (
+                property_name not in entity
+                or property_name in entity.exclude_from_indexes
+            ):
+                return False
+
+            value = entity[property_name]
+            values = value if isinstance(value, list) else [value]
+            try:
+                if not any(OPERATORS[operator](item, target) for item in values):
+                    return False
+            except TypeError:
+                return False
+
+        return True
+
+    def fetch(self, limit=None, offset=0, **kwargs):
+        self.client._call(kwargs.get("timeout"))
+        with self.client._lock:
+            entities = [
+                entity for entity in self.client._data.values() if self._matches(entity)
+            ]
+
+        entities.sort(key=lambda entity: entity.key.flat_path)
+        for order in reversed(self.order):
+            name = order.lstrip("-")
+            if name == "__scatter__":
+                continue
+            entities = [
+                entity for entity in entities if name not in entity.exclude_from_indexes
+            ]
+            entities.sort(
+                key=lambda entity: _sort_key(entity.get(name)),
+                reverse=order.startswith("-"),
+            )
+
+        entities = entities[offset or 0 :]
+        next_page_token = None
+        if limit is not None and len(entities) > limit:
+            entities = entities[:limit]
+            next_page_token = b"more"
+
+        if self._keys_only:
+            entities = [datastore.Entity(key=entity.key) for entity in entities]
+        else:
+            entities = [copy.deepcopy(entity) for entity in entities]
+
+        return Iterator(entities, next_page_token)
+
+
+class Client:
+    """
+    Keeps entities in a dict keyed by their full path. latency is a number
+    of seconds, or a function returning one, slept on every call; a call
+    whose latency exceeds its timeout raises DeadlineExceeded instead.
+    failure_rate is the fraction of calls that raise ServiceUnavailable.
+    index_writes counts the index rows of the entities written, and each
+    write also sleeps index_latency seconds per row.
+    """
+
+    def __init__(
+        self, project="local", latency=0.0, failure_rate=0.0, index_latency=0.0
+    ):
+        self.project = project
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.index_latency = index_latency
+        self.calls = 0
+        self.index_writes = 0
+        self._data = {}
+        self._ids = itertools.count(1 << 40)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def _call(self, timeout=None):
+        self.calls += 1
+        latency = self.latency() if callable(self.latency) else self.latency
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise exceptions.DeadlineExceeded("Deadline exceeded")
+
+        if latency:
+            time.sleep(latency)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise exceptions.ServiceUnavailable("Injected failure")
+
+    @property
+    def current_transaction(self):
+        return getattr(self._local, "transaction", None)
+
+    def transaction(self, **kwargs):
+        return Transaction(self)
+
+    def key(self, *path_args, **kwargs):
+        kwargs.setdefault("project", self.project)
+        return datastore.Key(*path_args, **kwargs)
+
+    def query(self, **kwargs):
+        return Query(self, kwargs.get("kind"), kwargs.get("ancestor"))
+
+    def get(self, key, **kwargs):
+        entities = self.get_multi([key], **kwargs)
+        return entities[0] if entities else None
+
+    def get_multi(self, keys, missing=None, **kwargs):
+        self._call(kwargs.get("timeout"))
+        entities = []
+        with self._lock:
+            for key in keys:
+                entity = self._data.get(key.flat_path)
+                if entity is not None:
+                    entities.append(copy.deepcopy(entity))
+                elif missing is not None:
+                    missing.append(datastore.Entity(key=key))
+        return entities
+
+    def put(self, entity, **kwargs):
+        self.put_multi([entity], **kwargs)
+
+    def put_multi(self, entities, **kwargs):
+        self._call(kwargs.get("timeout"))
+        rows = sum(index_entries(entity) for entity in entities)
+        if self.index_latency:
+            time.sleep(rows * self.index_latency)
+
+        with self._lock:
+            self.index_writes += rows
+            for entity in entities:
+                if entity.key.is_partial:
+                    entity.key = entity.key.completed_key(next(self._ids))
+
+                stored = copy.deepcopy(entity)
+                for name, value in stored.items():
+                    stored[name] = _utc(value)
+                self._data[entity.key.flat_path] = stored
+
+    def delete(self, key, **kwargs):
+        self.delete_multi([key], **kwargs)
+
+    def delete_multi(self, keys, **kwargs):
+        self._call(kwargs.get("timeout"))
+        with self._lock:
+            for key in keys:
+                self._data.pop(key.flat_path, None)
@@ -0,0 +1,27 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Gunicorn settings for App Engine, with gevent workers for product streams
+"""
+
+import multiprocessing
+from os import environ as env
+
+bind = f":{env.get('PORT', '8080')}"
+
+# Every route runs on gevent. Each open stream waits on a greenlet instead
+# of a thread, so an instance can hold thousands of idle streams; but CPU
+# work, such as the sales scan or a snapshot build, holds up every greenlet
+# of its worker, so there is a worker per CPU to keep the others serving
+worker_class = "gevent"
+workers = int(env.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_connections = 10000
+
+
+def post_fork(server, worker):
+    # Lets the gRPC calls of the Datastore client cooperate with gevent
+    from grpc.experimental import gevent as grpc_gevent
+
+    grpc_gevent.init_gevent()
@@ -0,0 +1,219 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Pooled keep-alive HTTP session for outbound Auth0 calls
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import constants
+import metrics
+import requests
+from authlib.integrations.requests_client import OAuth2Session
+from requests.adapters import HTTPAdapter
+
+TIMEOUT = (constants.http_connect_timeout, constants.http_read_timeout)
+POOL_SIZE = constants.http_pool_size
+MAX_RETRIES = constants.http_max_retries
+BACKOFF = constants.http_backoff
+FAILURE_THRESHOLD = constants.circuit_failure_threshold
+RESET_TIMEOUT = constants.circuit_reset_timeout
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host that keeps failing."""
+
+
+class CircuitBreaker:
+    """
+    Opens after FAILURE_THRESHOLD consecutive failures so callers fail fast
+    instead of tying up worker threads, then lets one trial call through
+    after RESET_TIMEOUT seconds to decide whether to close again.
+    """
+
+    def __init__(self, name, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_running):
+                metrics.incr(f"http.{self.name}.rejected")
+                raise CircuitOpenError(f"Circuit to {self.name} is open")
+            if state == "half-open":
+                self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+session = requests.Session()
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def get_breaker(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def _track_in_flight(delta):
+    global _in_flight
+
+    with _in_flight_lock:
+        _in_flight += delta
+        metrics.gauge("http.in_flight", _in_flight)
+
+
+def _send(send, method, url, **kwargs):
+    """Sends one request through the host's breaker and records its latency."""
+    host = urlsplit(url).hostname
+    breaker = get_breaker(host)
+    breaker.before_call()
+
+    kwargs.setdefault("timeout", TIMEOUT)
+    _track_in_flight(1)
+    start = time.perf_counter()
+    response = None
+    try:
+        response = send(method, url, **kwargs)
+    except requests.RequestException:
+        metrics.incr(f"http.{host}.errors")
+        raise
+    finally:
+        _track_in_flight(-1)
+        metrics.observe(f"http.{host}.latency", time.perf_counter() - start)
+        # Whatever ends the call settles a half-open trial; an exception
+        # of any type is a failure, or the breaker would stay open for good
+        if response is not None and response.status_code < 500:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    return response
+
+
+def request(method, url, **kwargs):
+    """
+    Sends a request through the shared session. Idempotent requests are
+    retried on connection errors and retryable statuses with full-jitter
+    exponential backoff; other requests only when they never connected.
+    """
+    idempotent = method.upper() in {"GET", "HEAD", "OPTIONS"}
+    attempt = 0
+    while True:
+        try:
+            response = _send(session.request, method, url, **kwargs)
+            if not (
+                idempotent
+                and response.status_code in RETRY_STATUSES
+                and attempt < MAX_RETRIES
+            ):
+                return response
+        except CircuitOpenError:
+            raise
+        except requests.ConnectTimeout:
+            if attempt >= MAX_RETRIES:
+                raise
+        except (requests.ConnectionError, requests.Timeout):
+            if not idempotent or attempt >= MAX_RETRIES:
+                raise
+
+        attempt += 1
+        metrics.incr("http.retries")
+        time.sleep(random.uniform(0, BACKOFF * 2**attempt))
+
+
+def get_json(url, **kwargs):
+    response = request("GET", url, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+class PooledOAuth2Session(OAuth2Session):
+    """
+    The Authlib session used for OIDC metadata and token exchanges. Authlib
+    creates one per call, so it borrows the shared adapter to keep its
+    connections alive and goes through the same breaker and timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        return _send(super().request, method, url, **kwargs)
+
+    def close(self):
+        # Closing the shared adapter would drop every pooled connection
+        for mounted in self.adapters.values():
+            if mounted is not adapter:
+                mounted.close()
+
+
+def pool_stats():
+    """Reports connections opened and requests served per pooled host."""
+    stats = {"maxsize": POOL_SIZE, "hosts": {}}
+    for pool_key in list(adapter.poolmanager.pools.keys()):
+        pool = adapter.poolmanager.pools.get(pool_key)
+        if pool is None:
+            continue
+        stats["hosts"][pool.host] = {
+            "connections": pool.num_connections,
+            "requests": pool.num_requests,
+            "idle": (
+                sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                if pool.pool
+                else 0
+            ),
+        }
+
+    stats["breakers"] = {host: breaker.state for host, breaker in _breakers.items()}
+    return stats
+
+
+metrics.register_collector("http", pool_stats)
@@ -0,0 +1,239 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Replays stored responses for requests with an Idempotency-Key
+"""
+
+import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import constants
+import db
+from flask import current_app, jsonify, make_response, request
+from google.cloud import datastore
+
+PROJECT_ID = constants.project_id
+IDEMPOTENCY_KEYS = constants.idempotency_keys
+TTL = constants.idempotency_ttl
+CACHE_SIZE = constants.idempotency_cache_size
+WAIT_TIMEOUT = constants.idempotency_wait_timeout
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# How long a claim may stay unanswered before another instance may take it over
+CLAIM_TTL = 60
+
+client = db.client
+
+
+class ResponseCache:
+    """A thread-safe LRU of stored responses in front of the Datastore kind."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            record = self._entries.get(key)
+            if record is None:
+                return None
+
+            if record["expiresAt"] <= _now():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return record
+
+    def set(self, key, record):
+        with self._lock:
+            self._entries[key] = record
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+cache = ResponseCache(CACHE_SIZE)
+
+# Requests currently being executed in this process, by scoped key
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _scope(idempotency_key):
+    """Scopes the key to the caller so two users never share a response."""
+    caller = request.headers.get("Authorization", "")
+    return hashlib.sha256(f"{caller}\n{idempotency_key}".encode()).hexdigest()
+
+
+def _fingerprint():
+    """Identifies the request a key was first used with."""
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.full_path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _acquire(scoped):
+    """Returns None if this thread owns the key, or the Event to wait on."""
+    with _in_flight_lock:
+        event = _in_flight.get(scoped)
+        if event is None:
+            _in_flight[scoped] = threading.Event()
+            return None
+        return event
+
+
+def _release(scoped):
+    with _in_flight_lock:
+        event = _in_flight.pop(scoped)
+    event.set()
+
+
+def _claim(scoped, fingerprint):
+    """
+    Claims the key in Datastore so other instances see the request in flight.
+    Returns the existing record if the key is already claimed or answered.
+    """
+    key = client.key(IDEMPOTENCY_KEYS, scoped)
+    with client.transaction():
+        record = client.get(key)
+        if record and record["expiresAt"] > _now():
+            return record
+
+        claim = datastore.Entity(key=key)
+        claim.update(
+            {
+                "fingerprint": fingerprint,
+                "status": None,
+                "expiresAt": _now() + datetime.timedelta(seconds=CLAIM_TTL),
+            }
+        )
+        client.put(claim)
+
+    return None
+
+
+def _store(scoped, fingerprint, response):
+    record = datastore.Entity(
+        key=client.key(IDEMPOTENCY_KEYS, scoped),
+        exclude_from_indexes=("body", "mimetype"),
+    )
+    record.update(
+        {
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "body": response.get_data(),
+            "mimetype": response.mimetype,
+            "expiresAt": _now() + datetime.timedelta(seconds=TTL),
+        }
+    )
+    client.put(record)
+    cache.set(scoped, record)
+
+
+def _replay(record, fingerprint):
+    if record["fingerprint"] != fingerprint:
+        return (
+            jsonify(
+                {"Error": "This Idempotency-Key was already used for another request"}
+            ),
+            422,
+        )
+
+    if record["status"] is None:
+        return (
+            jsonify({"Error": "A request with this Idempotency-Key is in progress"}),
+            409,
+        )
+
+    response = current_app.response_class(
+        record["body"], status=record["status"], mimetype=record["mimetype"]
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(*methods):
+    """
+    Makes the given methods of a view safe to retry with an Idempotency-Key
+    header. The first response is stored and replayed to every retry, and a
+    duplicate arriving while the first one runs waits for its response.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            idempotency_key = request.headers.get(HEADER)
+            if request.method not in methods or not idempotency_key:
+                return view(*args, **kwargs)
+
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                return (
+                    jsonify({"Error": "The Idempotency-Key header is too long"}),
+                    400,
+                )
+
+            scoped = _scope(idempotency_key)
+            fingerprint = _fingerprint()
+
+            # Wait for a duplicate running in this process, then replay its
+            # response, or take over if it did not leave one behind
+            while True:
+                record = cache.get(scoped)
+                if record:
+                    return _replay(record, fingerprint)
+
+                event = _acquire(scoped)
+                if event is None:
+                    break
+
+                if not event.wait(WAIT_TIMEOUT):
+                    return (
+                        jsonify(
+                            {
+                                "Error": "A request with this Idempotency-Key is in progress"
+                            }
+                        ),
+                        409,
+                    )
+
+            try:
+                record = _claim(scoped, fingerprint)
+                if record:
+                    if record["status"] is not None:
+                        cache.set(scoped, record)
+                    return _replay(record, fingerprint)
+
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except Exception:
+                    client.delete(client.key(IDEMPOTENCY_KEYS, scoped))
+                    raise
+
+                # Server errors are not stored so that the client can retry
+                if response.status_code >= 500 or response.is_streamed:
+                    client.delete(client.key(IDEMPOTENCY_KEYS, scoped))
+                else:
+                    _store(scoped, fingerprint, response)
+
+                return response
+
+            finally:
+                _release(scoped)
+
+        return wrapper
+
+    return decorator
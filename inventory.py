@@ -0,0 +1,239 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Handles inventory endpoints and the materialized inventory summary
+# Usage: python inventory.py rebuild [--workers N]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import catalog
+import constants
+import db
+from flask import Blueprint, jsonify, request
+from google.cloud import datastore
+from verifyJWT import AuthError, verify_admin
+
+PROJECT_ID = constants.project_id
+PRODUCTS = constants.products
+ORDERS = constants.orders
+INVENTORY = constants.inventory
+LIMIT = constants.limit
+LOW_STOCK_THRESHOLD = constants.low_stock_threshold
+
+BATCH_SIZE = 500
+
+bp = Blueprint("inventory", __name__, url_prefix="/inventory")
+client = db.client
+
+
+def summarize(product):
+    """Builds the inventory summary of a product entity."""
+    summary = datastore.Entity(
+        key=client.key(INVENTORY, product.key.id), exclude_from_indexes=("name",)
+    )
+    summary.update(
+        {
+            "name": product.get("name"),
+            "stock": product.get("stock", 0),
+            # Orders are listed on their products only while pending
+            "reserved": sum(
+                product_order["quantity"]
+                for product_order in product.get("orders") or []
+            ),
+        }
+    )
+    return summary
+
+
+@catalog.on_change
+def update_summaries(products, deleted):
+    """Keeps the summaries of written and deleted products up to date."""
+    summaries = [summarize(product) for product in products]
+    for index in range(0, len(summaries), BATCH_SIZE):
+        client.put_multi(summaries[index : index + BATCH_SIZE])
+
+    keys = [client.key(INVENTORY, product_id) for product_id in deleted]
+    for index in range(0, len(keys), BATCH_SIZE):
+        client.delete_multi(keys[index : index + BATCH_SIZE])
+
+
+def _split_keys(count):
+    """
+    Samples the products kind on its scatter property to find count - 1 keys
+    that split it into ranges of roughly equal size.
+    """
+    query = client.query(kind=PRODUCTS)
+    query.keys_only()
+    query.order = ["__scatter__"]
+    oversampling = 32
+    sample = sorted(
+        (entity.key for entity in query.fetch(limit=count * oversampling)),
+        key=lambda key: key.id,
+    )
+    return sample[oversampling::oversampling][: count - 1]
+
+
+def drop_settled_reservations(products):
+    """
+    Drops from products the reservations of orders that are no longer
+    pending or no longer exist, which orders settled before they released
+    their reservations left behind. Returns the products, as written.
+    """
+    order_ids = {
+        product_order["id"]
+        for product in products
+        for product_order in product.get("orders") or []
+    }
+    keys = [client.key(ORDERS, order_id) for order_id in order_ids]
+    pending = set()
+    for index in range(0, len(keys), 1000):
+        pending.update(
+            order.key.id
+            for order in client.get_multi(keys[index : index + 1000])
+            if order.get("status") == "pending"
+        )
+    settled = order_ids - pending
+
+    written = {}
+    for product in products:
+        if not any(
+            product_order["id"] in settled
+            for product_order in product.get("orders") or []
+        ):
+            continue
+
+        # Orders added since the product was read are kept
+        with client.transaction():
+            current = client.get(product.key)
+            if current is not None:
+                current["orders"] = [
+                    product_order
+                    for product_order in current.get("orders") or []
+                    if product_order["id"] not in settled
+                ]
+                catalog.stamp(current)
+                client.put(current)
+                written[current.key.id] = current
+
+    catalog.notify(*written.values())
+    return [written.get(product.key.id, product) for product in products]
+
+
+def _rebuild_range(start, end):
+    """Rewrites the summaries of the products in [start, end) in batches."""
+    query = client.query(kind=PRODUCTS)
+    if start is not None:
+        query.add_filter("__key__", ">=", start)
+    if end is not None:
+        query.add_filter("__key__", "<", end)
+
+    product_ids = set()
+    batch = []
+    for product in query.fetch():
+        product_ids.add(product.key.id)
+        batch.append(product)
+        if len(batch) >= BATCH_SIZE:
+            _summarize_batch(batch)
+            batch = []
+
+    if batch:
+        _summarize_batch(batch)
+
+    return product_ids
+
+
+def _summarize_batch(products):
+    products = drop_settled_reservations(products)
+    client.put_multi([summarize(product) for product in products])
+
+
+def rebuild(workers=8):
+    """
+    Recomputes the inventory summary from scratch, scanning key ranges of
+    the products kind in parallel, then drops summaries of deleted products.
+    Reservations of orders that are no longer pending are dropped first.
+    Returns the number of products summarized.
+    """
+    splits = _split_keys(workers)
+    ranges = list(zip([None] + splits, splits + [None]))
+
+    product_ids = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for range_ids in pool.map(lambda bounds: _rebuild_range(*bounds), ranges):
+            product_ids |= range_ids
+
+    query = client.query(kind=INVENTORY)
+    query.keys_only()
+    stale = [
+        summary.key for summary in query.fetch() if summary.key.id not in product_ids
+    ]
+    for index in range(0, len(stale), BATCH_SIZE):
+        client.delete_multi(stale[index : index + BATCH_SIZE])
+
+    return len(product_ids)
+
+
+@bp.route("/low-stock", methods=["GET"])
+def low_stock_get():
+    """
+    Return the products with a stock under the threshold, lowest first
+    """
+    try:
+        verify_admin(request)
+    except AuthError as e:
+        return jsonify(e.error), e.status_code
+
+    if "application/json" not in request.accept_mimetypes:
+        return (
+            jsonify({"Error": "This endpoint only returns JSON data"}),
+            406,
+        )
+
+    try:
+        threshold = int(request.args.get("threshold", LOW_STOCK_THRESHOLD))
+        q_limit = int(request.args.get("limit", LIMIT))
+        q_offset = int(request.args.get("offset", "0"))
+    except ValueError:
+        return (
+            jsonify({"Error": "threshold, limit and offset must be integers"}),
+            400,
+        )
+
+    query = client.query(kind=INVENTORY)
+    query.add_filter("stock", "<", threshold)
+    query.order = ["stock"]
+    l_iterator = query.fetch(limit=q_limit, offset=q_offset)
+    products = []
+    for summary in next(l_iterator.pages):
+        summary["id"] = summary.key.id
+        summary["self"] = f"{request.url_root}products/{summary.key.id}"
+        products.append(summary)
+
+    results = {"products": products, "threshold": threshold}
+
+    if l_iterator.next_page_token:
+        next_offset = q_offset + q_limit
+        results["next"] = (
+            f"{request.base_url}?threshold={threshold}"
+            f"&limit={q_limit}&offset={next_offset}"
+        )
+
+    return jsonify(results), 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the inventory summary")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        print(f"Summarized {rebuild(args.workers)} products")
+
+
+if __name__ == "__main__":
+    main()
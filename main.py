@@ -10,12 +10,24 @@ import json
 from functools import wraps
 from os import environ as env
 from urllib.parse import quote_plus, urlencode
-from urllib.request import urlopen
 
+import analytics
+import catalog
+import compression
 import constants
+import db
+import debug
+import http_client
+import inventory
+import json_provider
+import memprofile
 import order
 import product
+import profiler
+import ratelimit
 import requests
+import sweeper
+import traffic
 import user
 from authlib.integrations.flask_client import OAuth
 from dotenv import find_dotenv, load_dotenv
@@ -36,17 +48,36 @@ AUTH0_DOMAIN = env.get("AUTH0_DOMAIN")
 
 app = Flask(__name__)
 app.secret_key = env.get("APP_SECRET_KEY")
+app.json = json_provider.FastJSONProvider(app)
 
 USERS = constants.users
 PRODUCTS = constants.products
 ORDERS = constants.orders
+INVENTORY = constants.inventory
 DATA_MODEL = [USERS, PRODUCTS, ORDERS]
 PROJECT_ID = constants.project_id
-client = datastore.Client(project=PROJECT_ID)
+# Datastore writes at most 500 entities per call
+CLEANUP_BATCH_SIZE = 500
+client = db.client
 
 app.register_blueprint(user.bp)
 app.register_blueprint(product.bp)
 app.register_blueprint(order.bp)
+app.register_blueprint(analytics.bp)
+app.register_blueprint(inventory.bp)
+app.register_blueprint(sweeper.bp)
+app.register_blueprint(debug.bp)
+
+db.init_app(app)
+ratelimit.init_app(app)
+compression.init_app(app)
+traffic.init_app(app)
+memprofile.init_app(app)
+profiler.init_app(app)
+
+# Cron runs the sweeper on App Engine; elsewhere it can run in process
+if env.get("SWEEP_IN_PROCESS"):
+    sweeper.start()
 
 oauth = OAuth(app)
 oauth.register(
@@ -58,35 +89,28 @@ oauth.register(
     },
     server_metadata_url=f"https://{AUTH0_DOMAIN}/.well-known/openid-configuration",
 )
+# Share the pooled session for OIDC metadata and token exchanges
+oauth.auth0.client_cls = http_client.PooledOAuth2Session
+
+
+@app.errorhandler(AuthError)
+def handle_auth_error(e):
+    return jsonify(e.error), e.status_code
 
 
 @app.route("/")
 def index():
     if session.get("user"):
         user_info = session.get("user")["userinfo"]
-        sub = user_info["sub"]
 
         # If the user is not in the datastore, add them
-        user_key = client.key(USERS, sub)
-        user = client.get(key=user_key)
-
-        if not user:
-            new_user = datastore.entity.Entity(key=client.key(USERS, sub))
-            new_user.update(
-                {
-                    "name": user_info["name"],
-                    "email": user_info["email"],
-                }
-            )
-
-            client.put(new_user)
-            user = new_user
+        user.ensure_user(user_info)
 
         return render_template(
             "user-info.html",
             session=session.get("user"),
             pretty=json.dumps(session.get("user"), indent=4),
-            user_id=user.key.name,
+            user_id=user_info["sub"],
             id_token=session["user"]["id_token"],
         )
 
@@ -120,7 +144,13 @@ def login():
         }
         headers = {"content-type": "application/json"}
         url = "https://" + AUTH0_DOMAIN + "/oauth/token"
-        r = requests.post(url, json=body, headers=headers)
+        try:
+            r = http_client.post(url, json=body, headers=headers)
+        except requests.RequestException:
+            return (
+                jsonify({"Error": "The login service is unavailable, try again later"}),
+                503,
+            )
 
         if r.status_code != 200:
             return r.text, 401, {"Content-Type": "application/json"}
@@ -131,6 +161,7 @@ def login():
 @app.route("/callback")
 def callback():
     token = oauth.auth0.authorize_access_token()
+    user.ensure_user(token["userinfo"])
     session["user"] = token
     return redirect("/")
 
@@ -154,7 +185,18 @@ def logout():
 
 @app.route("/cleanup", methods=["DELETE"])
 def cleanup():
-    for kind in [PRODUCTS, ORDERS]:
+    # Products are deleted like DELETE /products/<id> does, so that syncing
+    # clients, the caches, the inventory summaries and the snapshot see it
+    query = client.query(kind=PRODUCTS)
+    query.keys_only()
+    product_ids = [result.key.id for result in query.fetch()]
+    for index in range(0, len(product_ids), CLEANUP_BATCH_SIZE):
+        batch = product_ids[index : index + CLEANUP_BATCH_SIZE]
+        client.delete_multi([client.key(PRODUCTS, product_id) for product_id in batch])
+        client.put_multi([catalog.tombstone(product_id) for product_id in batch])
+        catalog.notify(deleted=batch)
+
+    for kind in [ORDERS, INVENTORY]:
         query = client.query(kind=kind)
         results = list(query.fetch())
         for result in results:
@@ -0,0 +1,228 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Samples the memory that requests allocate, per route, with tracemalloc
+"""
+
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from os import environ as env
+
+import constants
+from flask import g, request
+
+# Profiling is off unless MEMORY_PROFILE_RATE is above 0
+SAMPLE_RATE = float(env.get("MEMORY_PROFILE_RATE", "0"))
+TRACE_FRAMES = constants.memory_trace_frames
+TOP_SITES = constants.memory_top_sites
+
+# How often the peak watcher checks the traced size, and by how much it must
+# grow before the watcher takes another snapshot: at least MIN_GROWTH bytes
+# and a quarter of the growth so far, so a request takes few snapshots
+WATCH_INTERVAL = 0.005
+MIN_GROWTH = 256 * 1024
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Allocations inside the Datastore client wrappers belong to their callers
+CLIENT_FILES = {os.path.join(APP_DIR, name) for name in ("db.py", "fake_datastore.py")}
+
+# Allocations of tracemalloc itself and of imports are not the handler's
+IGNORED_FILES = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap")
+
+
+class RouteMemory:
+    """The peak and net allocations of the sampled requests of a route."""
+
+    def __init__(self):
+        self.samples = 0
+        self.peak_total = 0
+        self.peak_max = 0
+        self.net_total = 0
+        self.sites = Counter()
+
+    def add(self, peak, net, sites):
+        self.samples += 1
+        self.peak_total += peak
+        self.peak_max = max(self.peak_max, peak)
+        self.net_total += net
+        self.sites.update(sites)
+
+    def report(self):
+        return {
+            "samples": self.samples,
+            "peakMean": self.peak_total // self.samples,
+            "peakMax": self.peak_max,
+            "netMean": self.net_total // self.samples,
+            "topSites": [
+                {"site": site, "bytes": size // self.samples}
+                for site, size in self.sites.most_common(TOP_SITES)
+            ],
+        }
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot()
+
+
+class PeakWatcher(threading.Thread):
+    """
+    Snapshots the traces each time a sampled request grows past its highest
+    point so far. Handlers free most of what they allocate before they
+    return, so the sites worth reporting are those alive at the peak.
+    """
+
+    def __init__(self, interval=WATCH_INTERVAL):
+        super().__init__(name="memprofile", daemon=True)
+        self.interval = interval
+        self._watching = threading.Event()
+        self._lock = threading.Lock()
+        self._start_size = 0
+        self._best_size = 0
+        self._best = None
+
+    def watch(self, start_size):
+        with self._lock:
+            self._start_size = start_size
+            self._best_size = start_size
+            self._best = None
+        self._watching.set()
+
+    def stop(self):
+        """Stops watching and returns the snapshot closest to the peak."""
+        self._watching.clear()
+        with self._lock:
+            best, self._best = self._best, None
+        return best
+
+    def run(self):
+        while True:
+            self._watching.wait()
+            size = tracemalloc.get_traced_memory()[0]
+            growth = max(MIN_GROWTH, (self._best_size - self._start_size) // 4)
+            if size > self._best_size + growth:
+                snapshot = _snapshot()
+                with self._lock:
+                    if self._watching.is_set():
+                        self._best_size = size
+                        self._best = snapshot
+            time.sleep(self.interval)
+
+
+_routes = {}
+_routes_lock = threading.Lock()
+# tracemalloc counts the whole process, so one request is sampled at a time
+_sampling = threading.Lock()
+_sample_rate = 0.0
+_watcher = None
+
+
+def _site(traceback):
+    """The innermost frame of the app in a traceback, or the innermost one."""
+    for frame in reversed(traceback):
+        if frame.filename.startswith(APP_DIR) and frame.filename not in CLIENT_FILES:
+            return f"{os.path.relpath(frame.filename, APP_DIR)}:{frame.lineno}"
+
+    frame = traceback[-1]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+def start():
+    """Starts measuring the current request, if it is sampled."""
+    if random.random() >= _sample_rate or not _sampling.acquire(blocking=False):
+        return
+
+    try:
+        before = _snapshot()
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        g.memory_started = (before, start_size)
+        _watcher.watch(start_size)
+    except Exception:
+        _sampling.release()
+        raise
+
+
+def finish(exc=None):
+    """
+    Records the peak and net allocations of a sampled request, and the sites
+    of what it held at its peak, or at its end for requests that stay small.
+    """
+    started = g.pop("memory_started", None)
+    if started is None:
+        return
+
+    try:
+        # Sampling was turned off during the request
+        if not tracemalloc.is_tracing():
+            _watcher.stop()
+            return
+
+        before, start_size = started
+        size, peak = tracemalloc.get_traced_memory()
+        at_peak = _watcher.stop() or _snapshot()
+        sites = Counter()
+        for stat in at_peak.compare_to(before, "traceback"):
+            if stat.size_diff > 0 and not stat.traceback[-1].filename.startswith(
+                IGNORED_FILES
+            ):
+                sites[_site(stat.traceback)] += stat.size_diff
+
+        route = (
+            f"{request.method} {request.url_rule.rule}"
+            if request.url_rule
+            else "unmatched"
+        )
+        with _routes_lock:
+            stats = _routes.setdefault(route, RouteMemory())
+            stats.add(peak - start_size, size - start_size, sites)
+    finally:
+        _sampling.release()
+
+
+def report():
+    """The memory of the sampled requests per route, highest peak first."""
+    with _routes_lock:
+        routes = {route: stats.report() for route, stats in _routes.items()}
+
+    return {
+        "sampleRate": _sample_rate,
+        "routes": dict(sorted(routes.items(), key=lambda item: -item[1]["peakMax"])),
+    }
+
+
+def reset():
+    with _routes_lock:
+        _routes.clear()
+
+
+def set_sample_rate(sample_rate):
+    """
+    Samples sample_rate of the requests from now on. Tracing slows every
+    allocation of the process while it is on, so it is meant for staging
+    and benchmarks.
+    """
+    global _sample_rate, _watcher
+
+    _sample_rate = sample_rate
+    if sample_rate <= 0:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+    if _watcher is None:
+        _watcher = PeakWatcher()
+        _watcher.start()
+
+
+def init_app(app):
+    app.before_request(start)
+    app.teardown_request(finish)
+    set_sample_rate(SAMPLE_RATE)
@@ -0,0 +1,108 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: In-process counters, gauges and latency timers
+"""
+
+import threading
+from collections import deque
+
+# Latency percentiles are computed over the most recent samples of a timer
+TIMER_SAMPLES = 1024
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timers = {}
+_collectors = {}
+
+
+class Timer:
+    """Count, total and max of a latency, plus recent samples for percentiles."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=TIMER_SAMPLES)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "meanMs": round(1000 * self.total / self.count, 3) if self.count else 0,
+            "p50Ms": round(1000 * self.percentile(0.50), 3),
+            "p95Ms": round(1000 * self.percentile(0.95), 3),
+            "p99Ms": round(1000 * self.percentile(0.99), 3),
+            "maxMs": round(1000 * self.max, 3),
+        }
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, seconds):
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = Timer()
+        timer.observe(seconds)
+
+
+def percentile(name, fraction):
+    """Returns a recent percentile of a timer in seconds, or None if unseen."""
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None or not timer.samples:
+            return None
+        return timer.percentile(fraction)
+
+
+def timer_count(name):
+    with _lock:
+        timer = _timers.get(name)
+        return timer.count if timer is not None else 0
+
+
+def counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def register_collector(name, collect):
+    """Adds a function whose dict result is reported under name on snapshot."""
+    _collectors[name] = collect
+
+
+def snapshot():
+    with _lock:
+        results = {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timers": {name: timer.summary() for name, timer in _timers.items()},
+        }
+
+    for name, collect in _collectors.items():
+        results[name] = collect()
+
+    return results
@@ -0,0 +1,257 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Compact models of products, orders, order lines and users, converted from and to entities
+"""
+
+import constants
+from google.cloud import datastore
+
+PROJECT_ID = constants.project_id
+USERS = constants.users
+PRODUCTS = constants.products
+ORDERS = constants.orders
+
+# The value of a property the entity does not have
+MISSING = object()
+
+
+class Model:
+    """
+    The properties of an entity in slots instead of a dict. Each model
+    lists its properties as (attribute, property name) pairs; properties
+    it does not know are kept in extra, so converting an entity to a model
+    and back loses nothing. Models held by caches are shared, so callers
+    must not change them.
+    """
+
+    __slots__ = ("id", "extra")
+    kind = None
+    fields = ()
+    # Properties holding lists of embedded entities, by model
+    embedded = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.names = {name: attribute for attribute, name in cls.fields}
+
+    def __init__(self, id=None, extra=None, **values):
+        self.id = id
+        self.extra = extra
+        for attribute, _ in self.fields:
+            setattr(self, attribute, values.pop(attribute, MISSING))
+        if values:
+            raise TypeError(f"Unknown {type(self).__name__} fields: {list(values)}")
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r})"
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.properties() == other.properties()
+
+    @classmethod
+    def from_properties(cls, id, properties):
+        model = cls.__new__(cls)
+        model.id = id
+        model.extra = None
+        for name, value in properties.items():
+            attribute = cls.names.get(name)
+            if attribute is None:
+                if model.extra is None:
+                    model.extra = {}
+                model.extra[name] = value
+            else:
+                setattr(model, attribute, cls._load(name, value))
+
+        for attribute, name in cls.fields:
+            if name not in properties:
+                setattr(model, attribute, MISSING)
+        return model
+
+    @classmethod
+    def from_entity(cls, entity):
+        id = entity.key.id_or_name if entity.key is not None else None
+        return cls.from_properties(id, entity)
+
+    # How a property value is held by the model, and back
+    @classmethod
+    def _load(cls, name, value):
+        model = cls.embedded.get(name)
+        if model is not None and isinstance(value, list):
+            return [
+                model.from_entity(item) if isinstance(item, datastore.Entity) else item
+                for item in value
+            ]
+        return value
+
+    def _dump(self, name, value, entity):
+        if name in self.embedded and isinstance(value, list):
+            return [
+                (
+                    (item.to_entity() if entity else item.properties())
+                    if isinstance(item, Model)
+                    else item
+                )
+                for item in value
+            ]
+        return value
+
+    def key(self):
+        """The key of the model, partial until it is stored."""
+        if self.id is None:
+            return datastore.Key(self.kind, project=PROJECT_ID)
+        return datastore.Key(self.kind, self.id, project=PROJECT_ID)
+
+    def properties(self, entity=False):
+        """The properties of the model as a dict, like those of its entity."""
+        properties = {}
+        for attribute, name in self.fields:
+            value = getattr(self, attribute)
+            if value is not MISSING:
+                properties[name] = self._dump(name, value, entity)
+        if self.extra:
+            properties.update(self.extra)
+        return properties
+
+    def to_entity(self):
+        entity = datastore.Entity(key=self.key())
+        entity.update(self.properties(entity=True))
+        return entity
+
+    def to_dict(self, url=None):
+        """The model as the API returns it, with its id and its URL."""
+        result = self.properties()
+        result["id"] = self.id
+        if url is not None:
+            result["self"] = url
+        return result
+
+
+class Product(Model):
+    __slots__ = ("name", "description", "price", "stock", "orders", "updated_at")
+    kind = PRODUCTS
+    fields = (
+        ("name", "name"),
+        ("description", "description"),
+        ("price", "price"),
+        ("stock", "stock"),
+        ("orders", "orders"),
+        ("updated_at", "updatedAt"),
+    )
+
+    @classmethod
+    def _load(cls, name, value):
+        # The orders holding a product, as (order id, quantity) pairs
+        if (
+            name == "orders"
+            and isinstance(value, list)
+            and all(
+                isinstance(order, dict) and order.keys() == {"id", "quantity"}
+                for order in value
+            )
+        ):
+            return tuple((order["id"], order["quantity"]) for order in value)
+        return value
+
+    def _dump(self, name, value, entity):
+        if name == "orders" and isinstance(value, tuple):
+            return [
+                {"id": order_id, "quantity": quantity} for order_id, quantity in value
+            ]
+        return value
+
+
+class LineItem(Model):
+    """A product in an order, at the price it had when it was added."""
+
+    __slots__ = ("name", "description", "price", "quantity")
+    kind = PRODUCTS
+    fields = (
+        ("name", "name"),
+        ("description", "description"),
+        ("price", "price"),
+        ("quantity", "quantity"),
+    )
+
+    @classmethod
+    def from_entity(cls, entity):
+        # Lines are stored with the product key and its id as a property
+        model = super().from_entity(entity)
+        if model.extra and "id" in model.extra:
+            model.id = model.extra.pop("id")
+        model.extra = model.extra or None
+        return model
+
+    def properties(self, entity=False):
+        properties = {"id": self.id}
+        properties.update(super().properties(entity))
+        return properties
+
+    @classmethod
+    def from_product(cls, product, quantity):
+        return cls(
+            id=product.id,
+            name=product.name,
+            description=product.description,
+            price=product.price,
+            quantity=quantity,
+        )
+
+
+class Order(Model):
+    __slots__ = (
+        "user_id",
+        "user",
+        "products",
+        "total",
+        "status",
+        "billing_address",
+        "payment_method",
+        "date_created",
+        "date_modified",
+    )
+    kind = ORDERS
+    fields = (
+        ("user", "user"),
+        ("products", "products"),
+        ("total", "total"),
+        ("status", "status"),
+        ("billing_address", "billingAddress"),
+        ("payment_method", "paymentMethod"),
+        ("date_created", "dateCreated"),
+        ("date_modified", "dateModified"),
+    )
+    embedded = {"products": LineItem}
+
+    def __init__(self, id=None, extra=None, user_id=None, **values):
+        super().__init__(id, extra, **values)
+        self.user_id = user_id
+
+    @classmethod
+    def from_entity(cls, entity):
+        model = super().from_entity(entity)
+        # Orders are stored under the user who placed them
+        parent = entity.key.parent if entity.key is not None else None
+        model.user_id = parent.id_or_name if parent is not None else None
+        return model
+
+    def key(self):
+        if self.user_id is None:
+            return super().key()
+        path = [USERS, self.user_id, ORDERS]
+        if self.id is not None:
+            path.append(self.id)
+        return datastore.Key(*path, project=PROJECT_ID)
+
+
+class User(Model):
+    __slots__ = ("name", "email", "orders")
+    kind = USERS
+    fields = (
+        ("name", "name"),
+        ("email", "email"),
+        ("orders", "orders"),
+    )
+    embedded = {"orders": Order}
@@ -8,10 +8,19 @@
 
 
 import datetime
-from flask import Blueprint, jsonify, request
-from google.cloud import datastore
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, Response, jsonify, request
+from google.api_core import exceptions
+import analytics
+import catalog
 import constants
-from verifyJWT import AuthError, verify_jwt
+import db
+import models
+from idempotency import idempotent
+from user import ensure_user
+from verifyJWT import AuthError, verify_admin, verify_jwt
 
 
 PROJECT_ID = constants.project_id
@@ -23,9 +32,19 @@ LIMIT = constants.limit
 ALLOWED_KEYS = {"status", "billingAddress", "paymentMethod"}
 STATUS_VALUES = {"pending", "completed", "canceled"}
 PAYMENT_METHOD_VALUES = {"credit", "debit", "cash"}
+MAX_BATCH_SIZE = 100
+
+# Status changes allowed by POST /orders:transition
+TRANSITIONS = {"pending": {"completed", "canceled"}}
+MAX_TRANSITION_SIZE = 5000
+# A transaction writes at most 500 entities: each order, its products and
+# its user
+MAX_TRANSACTION_WRITES = 500
+TRANSITION_WORKERS = constants.transition_workers
+TASK_DEADLINE = constants.task_deadline
 
 bp = Blueprint("order", __name__, url_prefix="/orders")
-client = datastore.Client(project=PROJECT_ID)
+client = db.client
 
 
 def is_valid_order(order):
@@ -44,7 +63,39 @@ def is_valid_order(order):
     return True
 
 
+def count_orders(sub):
+    """Counts the orders of a user with a keys-only query."""
+    query = client.query(kind=ORDERS, ancestor=client.key(USERS, sub))
+    query.keys_only()
+    return sum(1 for _ in query.fetch())
+
+
+def orders_page(sub, limit, offset):
+    """Returns a page of the orders of a user and whether more follow."""
+    query = client.query(kind=ORDERS, ancestor=client.key(USERS, sub))
+    l_iterator = query.fetch(limit=limit, offset=offset)
+    orders = list(l_iterator)
+    return orders, bool(l_iterator.next_page_token)
+
+
+def orders_results(orders, total_items, more, limit, offset, request_url, base_url):
+    """Builds the body of GET /orders from a page and the total count."""
+    results = {
+        "orders": [
+            models.Order.from_entity(order).to_dict(f"{request_url}/{order.key.id}")
+            for order in orders
+        ],
+        "totalItems": total_items,
+    }
+
+    if more:
+        results["next"] = f"{base_url}?limit={limit}&offset={offset + limit}"
+
+    return results
+
+
 @bp.route("", methods=["POST", "GET"])
+@idempotent("POST")
 def orders_post_get():
     """
     POST: Create a new order
@@ -68,17 +119,7 @@ def orders_post_get():
                 )
 
             sub = payload["sub"]
-            user_key = client.key(USERS, sub)
-            user = client.get(user_key)
-
-            if not user:
-                return (
-                    jsonify({"Error": "No user with this user_id exists"}),
-                    404,
-                )
-
-            user["id"] = user.key.name
-            user["self"] = request_url_root + "users/" + str(user.key.name)
+            ensure_user(payload)
 
             # Verify the content of the order
             content = request.get_json()
@@ -97,29 +138,31 @@ def orders_post_get():
                 )
 
             # Create a new order with the user as the parent
-            new_order_key = client.key(USERS, sub, ORDERS)
-            new_order = datastore.Entity(key=new_order_key)
-            new_order.update(
-                {
-                    "total": 0,
-                    "status": content["status"] if "status" in content else "pending",
-                    "billingAddress": content["billingAddress"],
-                    "paymentMethod": content["paymentMethod"],
-                    "dateCreated": datetime.datetime.now(),
-                    "dateModified": datetime.datetime.now(),
-                }
+            now = datetime.datetime.now()
+            new_order = models.Order(
+                user_id=sub,
+                total=0,
+                status=content["status"] if "status" in content else "pending",
+                billing_address=content["billingAddress"],
+                payment_method=content["paymentMethod"],
+                date_created=now,
+                date_modified=now,
             )
+            entity = new_order.to_entity()
 
-            client.put(new_order)
-            new_order["id"] = new_order.key.id
-            new_order["self"] = request_url_root + "orders/" + str(new_order.key.id)
+            client.put(entity)
+            analytics.record_order_change(None, analytics.order_snapshot(entity))
 
-            return jsonify(new_order), 201
+            new_order.id = entity.key.id
+            return (
+                jsonify(new_order.to_dict(f"{request_url_root}orders/{new_order.id}")),
+                201,
+            )
 
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
             )
 
     elif request.method == "GET":
@@ -132,35 +175,29 @@ def orders_post_get():
                     406,
                 )
 
-            request_url = request.url
             sub = payload["sub"]
-
-            user_key = client.key(USERS, sub)
-            query = client.query(kind=ORDERS, ancestor=user_key)
-            total_items = len(list(query.fetch()))
+            total_items = count_orders(sub)
 
             # Pagination
             q_limit = int(request.args.get("limit", LIMIT))
             q_offset = int(request.args.get("offset", "0"))
-            query = query.fetch(limit=q_limit, offset=q_offset)
-            orders = [
-                {"id": order.key.id, "self": f"{request_url}/{order.key.id}", **order}
-                for order in query
-            ]
-
-            results = {"orders": orders, "totalItems": total_items}
-
-            if query.next_page_token:
-                next_offset = q_offset + q_limit
-                next_url = f"{request.base_url}?limit={q_limit}&offset={next_offset}"
-                results["next"] = next_url
+            orders, more = orders_page(sub, q_limit, q_offset)
+            results = orders_results(
+                orders,
+                total_items,
+                more,
+                q_limit,
+                q_offset,
+                request.url,
+                request.base_url,
+            )
 
             return jsonify(results), 200
 
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
             )
 
 
@@ -195,25 +232,13 @@ def order_get_update_delete(id):
                     404,
                 )
 
-            # TODOs: Get the products in the order
-            products = order["products"]
-
-            order["id"] = order.key.id
-            order["self"] = request_url
+            return jsonify(models.Order.from_entity(order).to_dict(request_url)), 200
 
-            return jsonify(order), 200
-
-        except Exception as e:
-            if e == AuthError:
-                return (
-                    jsonify(e.error),
-                    401,
-                )
-            else:
-                return (
-                    "Unknown error",
-                    500,
-                )
+        except AuthError as e:
+            return (
+                jsonify(e.error),
+                e.status_code,
+            )
 
     elif request.method == "PUT":
         try:
@@ -253,28 +278,22 @@ def order_get_update_delete(id):
                     400,
                 )
 
+            before = analytics.order_snapshot(order)
+            status_before = order.get("status")
             order.update({key: content.get(key, order[key]) for key in ALLOWED_KEYS})
             order["dateModified"] = datetime.datetime.now()
-            client.put(order)
+            write_order(order, status_before)
+            analytics.record_order_change(before, analytics.order_snapshot(order))
 
-            order_index = next(
-                index
-                for index, user_order in enumerate(user_orders)
-                if user_order.id == order.key.id
-            )
-            if order_index is not None:
-                user_orders[order_index] = order
+            embed_order(user, order)
             client.put(user)
 
-            order["id"] = order.key.id
-            order["self"] = request.url
-
-            return jsonify(order), 200
+            return jsonify(models.Order.from_entity(order).to_dict(request.url)), 200
 
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
             )
 
     elif request.method == "PATCH":
@@ -315,28 +334,22 @@ def order_get_update_delete(id):
                     400,
                 )
 
+            before = analytics.order_snapshot(order)
+            status_before = order.get("status")
             order.update({key: content.get(key, order[key]) for key in ALLOWED_KEYS})
             order["dateModified"] = datetime.datetime.now()
-            client.put(order)
+            write_order(order, status_before)
+            analytics.record_order_change(before, analytics.order_snapshot(order))
 
-            order_index = next(
-                index
-                for index, user_order in enumerate(user_orders)
-                if user_order.id == order.key.id
-            )
-            if order_index is not None:
-                user_orders[order_index] = order
+            embed_order(user, order)
             client.put(user)
 
-            order["id"] = order.key.id
-            order["self"] = request.url
+            return jsonify(models.Order.from_entity(order).to_dict(request.url)), 200
 
-            return jsonify(order), 200
-
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
             )
 
     elif request.method == "DELETE":
@@ -368,17 +381,29 @@ def order_get_update_delete(id):
             user["orders"].pop(order_index)
             client.put(user)
 
-            client.delete(key)
+            # A pending order gives its stock back, like a canceled one
+            products = {}
+            with client.transaction():
+                if order.get("status") == "pending":
+                    products = order_products([order])
+                    release_order_products(order, products)
+                    catalog.stamp(*products.values())
+                    client.put_multi(list(products.values()))
+                client.delete(key)
+            catalog.notify(*products.values())
+            analytics.record_order_change(analytics.order_snapshot(order), None)
+
             return "", 204
 
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
             )
 
 
 @bp.route("/<oid>/products/<pid>", methods=["PUT", "DELETE"])
+@idempotent("PUT", "DELETE")
 def order_products_put_delete(oid, pid):
     """
     PUT: Add a product to an order
@@ -448,41 +473,37 @@ def order_products_put_delete(oid, pid):
                 )
 
             # Update the product
+            before = analytics.order_snapshot(order)
             product["stock"] -= quantity
             product_order = {
                 "id": order.key.id,
                 "quantity": quantity,
             }
             product["orders"].append(product_order)
+            catalog.stamp(product)
             client.put(product)
+            catalog.notify(product)
 
-            product["quantity"] = quantity
-            product["id"] = product.key.id
-            product.pop("stock")
-
-            order["products"].append(product)
+            line = models.LineItem.from_product(
+                models.Product.from_entity(product), quantity
+            )
+            order["products"].append(line.to_entity())
             order["total"] += product["price"] * quantity
             order["dateModified"] = datetime.datetime.now()
             client.put(order)
+            analytics.record_order_change(before, analytics.order_snapshot(order))
 
             # Update the order in the user
             user = client.get(client.key(USERS, sub))
-            user_orders = user["orders"]
-            for user_order in user_orders:
-                if user_order.id == order.key.id:
-                    user_order["products"] = order["products"]
-                    user_order["total"] = order["total"]
-                    user_order["dateModified"] = order["dateModified"]
-                    break
-
+            embed_order(user, order)
             client.put(user)
 
             return "", 204
 
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
             )
 
     elif request.method == "DELETE":
@@ -540,6 +561,7 @@ def order_products_put_delete(oid, pid):
                     403,
                 )
 
+            before = analytics.order_snapshot(order)
             order_product = order["products"][order_product_index]
             quantity = order_product["quantity"]
 
@@ -548,27 +570,588 @@ def order_products_put_delete(oid, pid):
                 if product_order["id"] == order.key.id:
                     product["orders"].pop(index)
                     break
+            catalog.stamp(product)
             client.put(product)
+            catalog.notify(product)
 
             order["total"] -= product["price"] * quantity
             order["dateModified"] = datetime.datetime.now()
             order["products"].pop(order_product_index)
             client.put(order)
+            analytics.record_order_change(before, analytics.order_snapshot(order))
 
             user = client.get(client.key(USERS, sub))
-            user_orders = user["orders"]
-            for user_order in user_orders:
-                if user_order.id == order.key.id:
-                    user_order["products"] = order["products"]
-                    user_order["total"] = order["total"]
-                    user_order["dateModified"] = order["dateModified"]
-                    client.put(user)
-                    break
+            if embed_order(user, order):
+                client.put(user)
 
             return "", 204
 
-        except Exception as e:
+        except AuthError as e:
             return (
                 jsonify(e.error),
-                401,
+                e.status_code,
+            )
+
+
+def embed_order(user, order):
+    """
+    Replaces the copy of an order kept in the orders of its user with the
+    order as it is now. Returns False if the user does not list the order.
+    """
+    user_orders = user.get("orders") or []
+    for index, user_order in enumerate(user_orders):
+        if user_order.id == order.key.id:
+            user_orders[index] = models.Order.from_entity(order).to_entity()
+            return True
+    return False
+
+
+def batch_item_result(product_id, status, error=None):
+    """Builds the result of one item of a batch request."""
+    result = {"productId": product_id, "status": status}
+    if error:
+        result["Error"] = error
+    return result
+
+
+def add_order_product(order, product, quantity):
+    """
+    Reserves the quantity of the product and adds a copy of it to the order.
+    Returns an error result tuple, or None if the product was added.
+    """
+    if product["stock"] <= 0 or product["stock"] < quantity:
+        return 403, "This product is out of stock"
+
+    if any(
+        order_product["id"] == product.key.id for order_product in order["products"]
+    ):
+        return 403, "This product is already in this order"
+
+    product["stock"] -= quantity
+    product["orders"].append({"id": order.key.id, "quantity": quantity})
+
+    line = models.LineItem.from_product(models.Product.from_entity(product), quantity)
+    order["products"].append(line.to_entity())
+    order["total"] += product["price"] * quantity
+    return None
+
+
+def remove_order_product(order, product):
+    """
+    Removes the product from the order and returns its quantity to stock.
+    Returns an error result tuple, or None if the product was removed.
+    """
+    for index, order_product in enumerate(order["products"]):
+        if order_product["id"] == product.key.id:
+            break
+    else:
+        return 403, "This product is not in this order"
+
+    quantity = order["products"].pop(index)["quantity"]
+    product["stock"] += quantity
+    product["orders"] = [
+        product_order
+        for product_order in product["orders"]
+        if product_order["id"] != order.key.id
+    ]
+    order["total"] -= product["price"] * quantity
+    return None
+
+
+@bp.route("/<oid>/products:batch", methods=["POST"])
+@idempotent("POST")
+def order_products_batch(oid):
+    """
+    POST: Add and remove several products of an order in one transaction
+    """
+    try:
+        payload = verify_jwt(request)
+        sub = payload["sub"]
+
+        if "application/json" not in request.accept_mimetypes:
+            return (
+                jsonify({"Error": "This endpoint only returns JSON data"}),
+                406,
+            )
+
+        items = request.get_json(silent=True)
+        if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_SIZE:
+            return (
+                jsonify(
+                    {
+                        "Error": f"The request must be a list of 1 to {MAX_BATCH_SIZE} products"
+                    }
+                ),
+                400,
             )
+
+        # Validate the shape of every item before touching Datastore
+        operations = []
+        for item in items:
+            try:
+                product_id = int(item["productId"])
+                remove = item.get("remove") is True
+                quantity = None if remove else int(item["quantity"])
+            except (TypeError, ValueError, KeyError, AttributeError):
+                operations.append(None)
+                continue
+
+            if not remove and quantity <= 0:
+                operations.append(None)
+                continue
+
+            operations.append((product_id, quantity))
+
+        with client.transaction():
+            user_key = client.key(USERS, sub)
+            order = client.get(client.key(ORDERS, int(oid), parent=user_key))
+
+            if not order:
+                return (
+                    jsonify({"Error": "No order with this order_id exists"}),
+                    404,
+                )
+
+            if order["status"] != "pending":
+                return (
+                    jsonify(
+                        {"Error": "You cannot add products to a non-pending order"}
+                    ),
+                    403,
+                )
+
+            before = analytics.order_snapshot(order)
+            # Orders created by POST /orders have no products yet
+            order.setdefault("products", [])
+
+            # Fetch every product of the batch in a single round-trip
+            product_ids = {
+                operation[0] for operation in operations if operation is not None
+            }
+            products = {
+                product.key.id: product
+                for product in client.get_multi(
+                    [client.key(PRODUCTS, product_id) for product_id in product_ids]
+                )
+            }
+
+            results = []
+            changed_products = {}
+            for item, operation in zip(items, operations):
+                if operation is None:
+                    results.append(
+                        batch_item_result(
+                            item.get("productId") if isinstance(item, dict) else None,
+                            400,
+                            "Each item needs a productId and a positive quantity, or remove: true",
+                        )
+                    )
+                    continue
+
+                product_id, quantity = operation
+                product = products.get(product_id)
+                if not product:
+                    results.append(
+                        batch_item_result(
+                            product_id, 404, "No product with this product_id exists"
+                        )
+                    )
+                    continue
+
+                if quantity is None:
+                    error = remove_order_product(order, product)
+                else:
+                    error = add_order_product(order, product, quantity)
+
+                if error:
+                    results.append(batch_item_result(product_id, *error))
+                    continue
+
+                changed_products[product_id] = product
+                results.append(batch_item_result(product_id, 204))
+
+            if changed_products:
+                order["dateModified"] = datetime.datetime.now()
+                entities = [order, *changed_products.values()]
+
+                # Update the order in the user
+                user = client.get(user_key)
+                if user and embed_order(user, order):
+                    entities.append(user)
+
+                catalog.stamp(*changed_products.values())
+                client.put_multi(entities)
+
+        catalog.notify(*changed_products.values())
+        analytics.record_order_change(before, analytics.order_snapshot(order))
+
+        return jsonify({"results": results, "total": order["total"]}), 200
+
+    except AuthError as e:
+        return (
+            jsonify(e.error),
+            e.status_code,
+        )
+
+
+def get_entities(keys):
+    """Looks up any number of keys, 1000 at a time."""
+    entities = []
+    for index in range(0, len(keys), 1000):
+        entities.extend(client.get_multi(keys[index : index + 1000]))
+    return entities
+
+
+def order_products(orders):
+    """Looks up the products of orders, by id."""
+    product_ids = {
+        int(order_product["id"])
+        for order in orders
+        for order_product in order.get("products") or []
+    }
+    return {
+        product.key.id: product
+        for product in get_entities(
+            [client.key(PRODUCTS, product_id) for product_id in product_ids]
+        )
+    }
+
+
+def release_order_products(order, products, restock=True):
+    """
+    Drops an order from the reservations of its products and, unless its
+    stock was sold, returns its quantities to their stock.
+    """
+    for order_product in order.get("products") or []:
+        product = products.get(int(order_product["id"]))
+        if not product:
+            continue
+
+        if restock:
+            product["stock"] += order_product["quantity"]
+        product["orders"] = [
+            product_order
+            for product_order in product.get("orders") or []
+            if product_order["id"] != order.key.id
+        ]
+
+
+def order_owner(order):
+    """
+    The sub of the user of an order: the parent of its key, or the user
+    property of orders stored without a parent.
+    """
+    parent = order.key.parent
+    if parent is not None and parent.name:
+        return parent.name
+    return order.get("user")
+
+
+def transition_orders(orders, status):
+    """
+    Moves pending orders to status in memory, releasing the reservations of
+    their products, with their stock restored on cancel, and updating the
+    copies of the orders kept in their users. Returns the changed products
+    and users; nothing is written.
+    """
+    now = datetime.datetime.now()
+    products = order_products(orders)
+
+    users = {
+        user.key.name: user
+        for user in get_entities(
+            [
+                client.key(USERS, sub)
+                for sub in {order_owner(order) for order in orders}
+                if sub
+            ]
+        )
+    }
+
+    for order in orders:
+        release_order_products(order, products, restock=status == "canceled")
+
+        order["status"] = status
+        order["dateModified"] = now
+
+        user = users.get(order_owner(order))
+        if user:
+            embed_order(user, order)
+
+    catalog.stamp(*products.values())
+    return list(products.values()), list(users.values())
+
+
+def write_order(order, status_before):
+    """
+    Writes an edited order. An order that leaves pending releases the
+    reservations of its products in the same transaction, with their stock
+    restored if it was canceled. Returns the changed products.
+    """
+    if status_before != "pending" or order.get("status") == "pending":
+        client.put(order)
+        return []
+
+    with client.transaction():
+        products = order_products([order])
+        release_order_products(
+            order, products, restock=order.get("status") == "canceled"
+        )
+        catalog.stamp(*products.values())
+        client.put_multi([order, *products.values()])
+
+    catalog.notify(*products.values())
+    return list(products.values())
+
+
+def order_batches(orders):
+    """
+    Groups the keys of orders so that changing a group, with its products
+    and its users, stays under the write limit of a transaction.
+    """
+    batch = []
+    writes = 0
+    for order in orders:
+        order_writes = 2 + len(order.get("products") or [])
+        if batch and writes + order_writes > MAX_TRANSACTION_WRITES:
+            yield batch
+            batch = []
+            writes = 0
+
+        batch.append(order.key)
+        writes += order_writes
+
+    if batch:
+        yield batch
+
+
+def transition_order_keys(keys, status, allowed):
+    """
+    Moves the orders of keys that allowed accepts to status in one
+    transaction, so an order is never written without its products and
+    users. Returns the changed orders, their snapshots before the change and
+    the changed products.
+    """
+    with client.transaction():
+        orders = [order for order in client.get_multi(keys) if allowed(order)]
+        befores = [analytics.order_snapshot(order) for order in orders]
+        products, users = transition_orders(orders, status)
+        if orders:
+            client.put_multi([*orders, *products, *users])
+
+    return orders, befores, products
+
+
+def transition_key(item):
+    """
+    The key of an order listed in the ids of POST /orders:transition: an
+    {"sub", "id"} pair for an order of a user, or an id for an order stored
+    without a parent. Returns None if the item is neither.
+    """
+    if isinstance(item, dict) and item.keys() == {"sub", "id"}:
+        sub, order_id = item["sub"], item["id"]
+        if isinstance(sub, str) and sub and type(order_id) is int and order_id > 0:
+            return client.key(USERS, sub, ORDERS, order_id)
+    elif type(item) is int and item > 0:
+        return client.key(ORDERS, item)
+    return None
+
+
+def transition_ref(key):
+    """Lists an order in the results of POST /orders:transition like in its ids."""
+    if key.parent is not None:
+        return {"sub": key.parent.name, "id": key.id}
+    return key.id
+
+
+def transition_skip(key, error, status=409):
+    """Builds the result of an order that POST /orders:transition left alone."""
+    result = {"id": key.id, "status": status, "Error": error}
+    if key.parent is not None:
+        result["sub"] = key.parent.name
+    return result
+
+
+def orders_transition():
+    """
+    POST: Move many orders to a new status, streaming the progress as
+    newline-delimited JSON
+    """
+    try:
+        verify_admin(request)
+    except AuthError as e:
+        return jsonify(e.error), e.status_code
+
+    content = request.get_json(silent=True)
+    if (
+        not isinstance(content, dict)
+        or content.get("status") not in STATUS_VALUES
+        or ("ids" in content) == ("filter" in content)
+    ):
+        return (
+            jsonify({"Error": "The request needs a status and either ids or a filter"}),
+            400,
+        )
+
+    status = content["status"]
+    skipped = []
+    deadline = time.monotonic() + TASK_DEADLINE
+    db.set_deadline(TASK_DEADLINE)
+
+    if "ids" in content:
+        ids = content["ids"]
+        keys = [transition_key(item) for item in ids] if isinstance(ids, list) else []
+        if not 0 < len(keys) <= MAX_TRANSITION_SIZE or None in keys:
+            return (
+                jsonify(
+                    {
+                        "Error": f"ids must be a list of 1 to {MAX_TRANSITION_SIZE} order ids or sub and id pairs"
+                    }
+                ),
+                400,
+            )
+
+        keys = list(dict.fromkeys(keys))
+        orders = get_entities(keys)
+        found = {order.key for order in orders}
+        skipped = [
+            transition_skip(key, "No order with this order_id exists", 404)
+            for key in keys
+            if key not in found
+        ]
+    else:
+        order_filter = content["filter"]
+        try:
+            older_than = float(order_filter.get("olderThanHours", 0))
+        except (AttributeError, TypeError, ValueError):
+            older_than = -1
+
+        if older_than < 0 or order_filter.get("status", "pending") not in STATUS_VALUES:
+            return (
+                jsonify(
+                    {
+                        "Error": "filter may only have a valid status and a non-negative olderThanHours"
+                    }
+                ),
+                400,
+            )
+
+        query = client.query(kind=ORDERS)
+        if "status" in order_filter:
+            query.add_filter("status", "=", order_filter["status"])
+        if older_than:
+            cutoff = datetime.datetime.now() - datetime.timedelta(hours=older_than)
+            query.add_filter("dateModified", "<", cutoff)
+        orders = list(query.fetch(limit=MAX_TRANSITION_SIZE))
+
+    def can_transition(order):
+        return status in TRANSITIONS.get(order.get("status"), ())
+
+    allowed = []
+    for order in orders:
+        if can_transition(order):
+            allowed.append(order)
+        else:
+            skipped.append(
+                transition_skip(
+                    order.key,
+                    f"An order cannot go from {order.get('status')} to {status}",
+                )
+            )
+
+    batches = list(order_batches(allowed))
+
+    def transition_batch(keys):
+        # Runs on the pool, outside the request, under the request's deadline
+        token = db.deadline.set(deadline)
+        try:
+            return transition_order_keys(keys, status, can_transition)
+        finally:
+            db.deadline.reset(token)
+
+    def progress():
+        yield json.dumps({"orders": len(allowed), "batches": len(batches)}) + "\n"
+
+        transitioned = []
+        failed = []
+        with ThreadPoolExecutor(
+            max_workers=TRANSITION_WORKERS, thread_name_prefix="transition"
+        ) as pool:
+            futures = {
+                pool.submit(transition_batch, keys): index
+                for index, keys in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                keys = batches[index]
+                try:
+                    orders, befores, products = future.result()
+                except Exception as e:
+                    # Nothing of the batch was written, so its orders can be
+                    # sent again; the other batches go on
+                    if isinstance(e, (exceptions.Aborted, exceptions.Conflict)):
+                        error = "The orders were changed by another request"
+                    else:
+                        error = "Writing the orders failed"
+                    failed.extend(transition_ref(key) for key in keys)
+                    yield json.dumps(
+                        {
+                            "batch": index,
+                            "Error": error,
+                            "ids": [transition_ref(key) for key in keys],
+                        }
+                    ) + "\n"
+                    continue
+
+                catalog.notify(*products)
+                analytics.record_order_changes(
+                    zip(befores, [analytics.order_snapshot(order) for order in orders])
+                )
+
+                changed = {order.key for order in orders}
+                transitioned.extend(
+                    transition_ref(key) for key in keys if key in changed
+                )
+                skipped.extend(
+                    transition_skip(key, "The order changed before it could be updated")
+                    for key in keys
+                    if key not in changed
+                )
+                yield json.dumps(
+                    {
+                        "batch": index,
+                        "transitioned": len(transitioned),
+                        "total": len(allowed),
+                    }
+                ) + "\n"
+
+        yield json.dumps(
+            {"transitioned": transitioned, "skipped": skipped, "failed": failed}
+        ) + "\n"
+
+    return Response(progress(), mimetype="application/x-ndjson")
+
+
+def cancel_stale_orders(keys, cutoff):
+    """
+    Cancels the orders of keys that are still pending and were last modified
+    before cutoff, in one transaction. Returns the canceled orders, their
+    snapshots before the change and the changed products.
+    """
+    return transition_order_keys(
+        keys,
+        "canceled",
+        lambda order: order.get("status") == "pending"
+        and order["dateModified"] < cutoff,
+    )
+
+
+# Registered on the app for the same reason as /products:batchGet
+bp.record(
+    lambda state: state.app.add_url_rule(
+        "/orders:transition",
+        endpoint="order.orders_transition",
+        view_func=orders_transition,
+        methods=["POST"],
+    )
+)
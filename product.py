@@ -7,22 +7,34 @@
 """
 
 
-from flask import Blueprint, jsonify, request
+import json
+from flask import Blueprint, Response, jsonify, request
 from google.cloud import datastore
+import catalog
 import constants
+import db
+import events
+import snapshot
+from idempotency import idempotent
 
 PROJECT_ID = constants.project_id
 USERS = constants.users
 PRODUCTS = constants.products
 ORDERS = constants.orders
 LIMIT = constants.limit
+CHANGES_LIMIT = constants.changes_limit
+STREAM_HEARTBEAT = constants.stream_heartbeat
 
 MAX_NAME_LENGTH = 100
 MAX_DESCRIPTION_LENGTH = 500
 ALLOWED_KEYS = {"name", "description", "price", "stock"}
+MAX_MULTI_GET = 1000
+MAX_CHANGES_LIMIT = 1000
+MAX_STREAM_IDS = 100
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 bp = Blueprint("product", __name__, url_prefix="/products")
-client = datastore.Client(project=PROJECT_ID)
+client = db.client
 
 
 def is_valid_product(product):
@@ -34,7 +46,61 @@ def is_valid_product(product):
     )
 
 
+def find_products(ids, url_root):
+    """
+    Returns the body and status of a multi-get of the products with the
+    given ids, in the order they were asked. The Flask and ASGI apps both
+    serve it, so it takes the URL root instead of reading the request.
+    """
+    try:
+        product_ids = list(dict.fromkeys(int(id) for id in ids))
+    except (TypeError, ValueError):
+        return {"Error": "The ids must be a list of product ids"}, 400
+
+    if not 0 < len(product_ids) <= MAX_MULTI_GET:
+        return {"Error": f"Between 1 and {MAX_MULTI_GET} ids can be requested"}, 400
+
+    found = snapshot.get_products(product_ids)
+    products = []
+    for product_id in product_ids:
+        product = found.get(product_id)
+        if product is not None:
+            products.append(product.to_dict(f"{url_root}products/{product_id}"))
+
+    results = {
+        "products": products,
+        "missing": [
+            product_id for product_id in product_ids if product_id not in found
+        ],
+    }
+    return results, 200
+
+
+def products_multi_get(ids):
+    """Returns the products with the given ids, in the order they were asked."""
+    results, status = find_products(ids, request.url_root)
+    return jsonify(results), status
+
+
+def products_page(limit, offset, request_url, base_url):
+    """Returns a page of products with the total number and the next link."""
+    products, total_items, more = snapshot.list_products(limit, offset)
+    results = {
+        "products": [
+            product.to_dict(f"{request_url}/{product.id}") for product in products
+        ],
+        "totalItems": total_items,
+    }
+
+    # Add next link if there are more products
+    if more:
+        results["next"] = f"{base_url}?limit={limit}&offset={offset + limit}"
+
+    return results
+
+
 @bp.route("", methods=["POST", "GET"])
+@idempotent("POST")
 def products_post_get():
     """
     POST: Create a new product
@@ -78,7 +144,9 @@ def products_post_get():
                 }
             )
 
+            catalog.stamp(new_product)
             client.put(new_product)
+            catalog.notify(new_product)
 
             new_product["id"] = new_product.key.id
             new_product["self"] = request_url + "/" + str(new_product.key.id)
@@ -99,30 +167,132 @@ def products_post_get():
                 406,
             )
 
-        request_url = request.url
+        # Get several products by id
+        if "ids" in request.args:
+            return products_multi_get(request.args["ids"].split(","))
 
-        # Get the total number of products
-        query = client.query(kind=PRODUCTS)
-        total_items = len(list(query.fetch()))
-
-        # Get the products with pagination
+        # Get the products with pagination and the total number of products
         q_limit = int(request.args.get("limit", LIMIT))
         q_offset = int(request.args.get("offset", "0"))
-        query = query.fetch(limit=q_limit, offset=q_offset)
-        products = [
-            {"id": product.key.id, "self": f"{request_url}/{product.key.id}", **product}
-            for product in query
-        ]
+        results = products_page(q_limit, q_offset, request.url, request.base_url)
+        return jsonify(results), 200
 
-        results = {"products": products, "totalItems": total_items}
 
-        # Add next link if there are more products
-        if query.next_page_token:
-            next_offset = q_offset + q_limit
-            next_url = f"{request.base_url}?limit={q_limit}&offset={next_offset}"
-            results["next"] = next_url
+def parse_changes_token(token):
+    """Parses a token of GET /products/changes into a (version, id) position."""
+    if token == "0":
+        return (0, 0)
 
-        return jsonify(results), 200
+    version, _, product_id = token.partition(".")
+    return (int(version), int(product_id))
+
+
+@bp.route("/changes", methods=["GET"])
+def products_changes_get():
+    """
+    Return the ids of the products created, changed or deleted since a token
+    """
+    if "application/json" not in request.accept_mimetypes:
+        return (
+            jsonify({"Error": "This endpoint only returns JSON data"}),
+            406,
+        )
+
+    try:
+        since = parse_changes_token(request.args.get("since", "0"))
+        q_limit = int(request.args.get("limit", CHANGES_LIMIT))
+    except ValueError:
+        return (
+            jsonify({"Error": "since must be a token returned by this endpoint"}),
+            400,
+        )
+
+    if not 0 < q_limit <= MAX_CHANGES_LIMIT:
+        return (
+            jsonify({"Error": f"limit must be between 1 and {MAX_CHANGES_LIMIT}"}),
+            400,
+        )
+
+    changed, deleted, last, more = catalog.changes_since(since, q_limit)
+    token = f"{last[0]}.{last[1]}" if last != (0, 0) else "0"
+    results = {"changed": changed, "deleted": deleted, "since": token}
+
+    if more:
+        results["next"] = f"{request.base_url}?since={token}&limit={q_limit}"
+
+    return jsonify(results), 200
+
+
+def stream_product_ids(args):
+    """
+    The products a stream follows, from its ids argument: None for every
+    product, or an error message if the ids are not valid.
+    """
+    if "ids" not in args:
+        return None, None
+
+    try:
+        product_ids = {int(id) for id in args["ids"].split(",")}
+    except ValueError:
+        product_ids = set()
+
+    if not 0 < len(product_ids) <= MAX_STREAM_IDS:
+        return None, f"ids must list 1 to {MAX_STREAM_IDS} product ids"
+
+    return product_ids, None
+
+
+def stream_frames(subscription, event, dropped):
+    """
+    The server-sent events that follow the next event of a subscription,
+    or a keep-alive when none came, and the count of events dropped so far.
+    """
+    frames = ""
+    if subscription.dropped > dropped:
+        # Tell the client it missed events, so it can refetch
+        frames += f"event: dropped\ndata: {subscription.dropped - dropped}\n\n"
+        dropped = subscription.dropped
+
+    if event is None:
+        frames += ": keep-alive\n\n"
+    else:
+        frames += f"event: product\ndata: {json.dumps(event)}\n\n"
+    return frames, dropped
+
+
+@bp.route("/stream", methods=["GET"])
+def products_stream_get():
+    """
+    Stream the stock and price changes of products as server-sent events
+    """
+    product_ids, error = stream_product_ids(request.args)
+    if error:
+        return jsonify({"Error": error}), 400
+
+    broker = events.get_broker()
+    subscription = broker.subscribe(product_ids)
+    if subscription is None:
+        return (
+            jsonify({"Error": "Too many open streams, try again later"}),
+            503,
+        )
+
+    def stream():
+        dropped = 0
+        yield "retry: 5000\n\n"
+        while True:
+            event = subscription.get(STREAM_HEARTBEAT)
+            frames, dropped = stream_frames(subscription, event, dropped)
+            yield frames
+
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers=STREAM_HEADERS,
+    )
+    # Runs when the server closes the response, even if it was never read
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
 
 
 @bp.route("/<id>", methods=["GET", "PATCH", "PUT", "DELETE"])
@@ -134,8 +304,7 @@ def product_get_update_delete(id):
                 406,
             )
 
-        key = client.key(PRODUCTS, int(id))
-        product = client.get(key)
+        product = snapshot.get_product(int(id))
 
         if not product:
             return (
@@ -143,10 +312,7 @@ def product_get_update_delete(id):
                 404,
             )
 
-        product["id"] = product.key.id
-        product["self"] = request.url
-
-        return jsonify(product), 200
+        return jsonify(product.to_dict(request.url)), 200
 
     elif request.method == "PUT":
         if "application/json" not in request.accept_mimetypes:
@@ -177,7 +343,9 @@ def product_get_update_delete(id):
             )
 
         product.update({key: content.get(key, product[key]) for key in ALLOWED_KEYS})
+        catalog.stamp(product)
         client.put(product)
+        catalog.notify(product)
 
         # Update the product in all pending orders
         query = client.query(kind=ORDERS)
@@ -236,7 +404,9 @@ def product_get_update_delete(id):
             )
 
         product.update({key: content.get(key, product[key]) for key in ALLOWED_KEYS})
+        catalog.stamp(product)
         client.put(product)
+        catalog.notify(product)
 
         # Update the product in all pending orders
         query = client.query(kind=ORDERS)
@@ -303,5 +473,39 @@ def product_get_update_delete(id):
                     break
 
         client.delete(key)
+        client.put(catalog.tombstone(product.key.id))
+        catalog.notify(deleted=[product.key.id])
 
         return "", 204
+
+
+def products_batch_get():
+    """
+    POST: Get several products by the ids in the request body
+    """
+    if "application/json" not in request.accept_mimetypes:
+        return (
+            jsonify({"Error": "This endpoint only returns JSON data"}),
+            406,
+        )
+
+    content = request.get_json(silent=True)
+    if not isinstance(content, dict) or not isinstance(content.get("ids"), list):
+        return (
+            jsonify({"Error": "The request object must have a list of ids"}),
+            400,
+        )
+
+    return products_multi_get(content["ids"])
+
+
+# Custom methods on the collection cannot be routed through the blueprint,
+# which always puts a slash between its prefix and the rule
+bp.record(
+    lambda state: state.app.add_url_rule(
+        "/products:batchGet",
+        endpoint="product.products_batch_get",
+        view_func=products_batch_get,
+        methods=["POST"],
+    )
+)
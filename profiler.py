@@ -0,0 +1,157 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Samples the stacks of all threads on demand, and times the phases of requests that ask for it
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import constants
+import metrics
+import timing
+from flask import request
+from verifyJWT import AuthError, verify_admin
+
+INTERVAL = constants.profile_interval
+MAX_DEPTH = constants.profile_max_depth
+
+# Requests with this header, from an admin, get a Server-Timing header
+HEADER = "X-Profile"
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _original(module, name):
+    """
+    The function gevent replaced, if it did. Under gevent the sampler must
+    run on an OS thread, or it would only ever see itself.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return getattr(__import__(module), name)
+    return monkey.get_original(module, name)
+
+
+_start_thread = _original("_thread", "start_new_thread")
+_get_ident = _original("_thread", "get_ident")
+_allocate_lock = _original("_thread", "allocate_lock")
+_sleep = _original("time", "sleep")
+# Under gevent, threading no longer knows the main thread by its OS ident
+_main_ident = _get_ident()
+
+
+@functools.lru_cache(maxsize=None)
+def _short_path(filename):
+    """A file's path from the app, or from the import path it was found on."""
+    for root in [APP_DIR] + sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(root + os.sep):
+            return os.path.relpath(filename, root)
+    return filename
+
+
+def _label(code):
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, thread_name):
+    """A stack in the collapsed format of flamegraph.pl, root first."""
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class Sampler:
+    """
+    Counts the stacks of every thread but its own, every interval seconds,
+    from an OS thread. The cost is one pass over the frames per thread per
+    sample, and nothing at all while no profile runs.
+    """
+
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self._stacks = Counter()
+        self._lock = _allocate_lock()
+        self._stopped = False
+        self._ident = None
+
+    def _run(self):
+        self._ident = _get_ident()
+        while not self._stopped:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            names.setdefault(_main_ident, "MainThread")
+            stacks = [
+                collapse(frame, names.get(ident, f"thread-{ident}"))
+                for ident, frame in sys._current_frames().items()
+                if ident != self._ident
+            ]
+            with self._lock:
+                self._stacks.update(stacks)
+            _sleep(self.interval)
+
+    def start(self):
+        _start_thread(self._run, ())
+
+    def stop(self):
+        """Stops sampling and returns the stacks counted."""
+        self._stopped = True
+        with self._lock:
+            return Counter(self._stacks)
+
+
+_profiling = threading.Lock()
+
+
+def profile(seconds, interval=INTERVAL):
+    """
+    Samples all threads for seconds and returns the collapsed stacks, one
+    per line with its count, or None if another profile is running.
+    """
+    if not _profiling.acquire(blocking=False):
+        return None
+
+    try:
+        sampler = Sampler(interval)
+        sampler.start()
+        # Sleeps cooperatively under gevent, so the other requests go on
+        time.sleep(seconds)
+        stacks = sampler.stop()
+    finally:
+        _profiling.release()
+
+    metrics.incr("profiler.profiles")
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def _start_request():
+    if HEADER not in request.headers:
+        return
+
+    try:
+        verify_admin(request)
+    except AuthError:
+        return
+
+    timing.start()
+
+
+def _finish_request(response):
+    server_timing = timing.finish()
+    if server_timing is not None:
+        response.headers["Server-Timing"] = server_timing
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,197 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Per-user token buckets and in-flight load shedding
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from os import environ as env
+
+import constants
+import metrics
+import shared_store
+from flask import g, jsonify, request
+from verifyJWT import cached_claims
+
+RATE_LIMITS = constants.rate_limits
+MAX_IN_FLIGHT = constants.max_in_flight
+
+MAX_BUCKETS = 10000
+
+# App Engine sets X-Appengine-User-Ip and strips it from client requests;
+# anywhere else a client could send it to pick its own bucket
+ON_APP_ENGINE = bool(env.get("GAE_ENV"))
+
+# Refills and takes one token atomically; returns the seconds to wait
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class LocalLimiter:
+    """Token buckets kept in this process, evicting the least recently used."""
+
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+
+class RedisLimiter:
+    """
+    Token buckets shared by every instance through Redis. While Redis fails,
+    each instance falls back to buckets of its own.
+    """
+
+    def __init__(self, redis):
+        from redis import RedisError
+
+        self._errors = RedisError
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = LocalLimiter()
+
+    def acquire(self, key, rate, burst):
+        try:
+            return float(
+                self._script(keys=["ratelimit:" + key], args=[rate, burst, time.time()])
+            )
+        except self._errors:
+            metrics.incr("ratelimit.redis_errors")
+            return self._fallback.acquire(key, rate, burst)
+
+
+_limiter = None
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+
+    if _limiter is None:
+        redis = shared_store.get_redis()
+        _limiter = RedisLimiter(redis) if redis else LocalLimiter()
+
+    return _limiter
+
+
+def identity(headers, remote_addr):
+    """
+    Keys the bucket by the JWT sub once the token verifies against the
+    cached signing keys, or by the client IP, so a made-up sub cannot pick
+    a fresh bucket or drain someone else's.
+    """
+    auth_header = headers.get("Authorization", "").split()
+    if len(auth_header) == 2:
+        claims = cached_claims(auth_header[1])
+        if claims and claims.get("sub"):
+            return "sub:" + claims["sub"]
+
+    if ON_APP_ENGINE and headers.get("X-Appengine-User-Ip"):
+        return "ip:" + headers["X-Appengine-User-Ip"]
+    return "ip:" + (remote_addr or "")
+
+
+def retry_after(seconds):
+    """The value of a Retry-After header, in whole seconds."""
+    return str(max(1, math.ceil(seconds)))
+
+
+def _too_busy(message, wait, status):
+    response = jsonify({"Error": message})
+    response.status_code = status
+    response.headers["Retry-After"] = retry_after(wait)
+    return response
+
+
+def enter():
+    """Counts a request in flight, or returns False if too many already are."""
+    global _in_flight
+
+    with _in_flight_lock:
+        if _in_flight >= MAX_IN_FLIGHT:
+            return False
+        _in_flight += 1
+        return True
+
+
+def leave():
+    global _in_flight
+
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def acquire(blueprint, headers, remote_addr):
+    """
+    Takes a token from the caller's bucket of a route, and returns the
+    seconds until one is free if it was empty, or 0.
+    """
+    limit = RATE_LIMITS.get(blueprint)
+    if not limit:
+        return 0
+
+    rate, burst = limit
+    key = identity(headers, remote_addr)
+    return get_limiter().acquire(f"{blueprint}:{key}", rate, burst)
+
+
+def _admit():
+    """Sheds load and enforces the route's bucket before the handler runs."""
+    if not enter():
+        return _too_busy("The server is too busy, try again later", 1, 503)
+    g.admitted = True
+
+    wait = acquire(request.blueprint, request.headers, request.remote_addr)
+    if wait > 0:
+        return _too_busy("Too many requests", wait, 429)
+
+    return None
+
+
+def _release(exc=None):
+    if g.pop("admitted", False):
+        leave()
+
+
+def init_app(app):
+    app.before_request(_admit)
+    app.teardown_request(_release)
@@ -0,0 +1,107 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Declares which properties of each kind are indexed, and rewrites stored entities to match
+# Usage: python schema.py migrate [--kind KIND ...] [--batch-size N]
+"""
+
+import argparse
+
+import constants
+import db
+
+USERS = constants.users
+PRODUCTS = constants.products
+ORDERS = constants.orders
+
+BATCH_SIZE = 500
+
+# The properties each kind is queried on; every other property of these
+# kinds is left out of the indexes. Kinds not listed here keep the indexes
+# their writers ask for.
+INDEXED = {
+    # GET /products/changes
+    PRODUCTS: {"updatedAt"},
+    # Product updates, the sweeper, bulk transitions and sales analytics
+    ORDERS: {"status", "dateCreated", "dateModified"},
+    USERS: set(),
+}
+
+
+def unindexed(entity):
+    """The properties of an entity that its kind leaves out of the indexes."""
+    indexed = INDEXED.get(entity.key.kind)
+    if indexed is None:
+        return set(entity.exclude_from_indexes)
+    return set(entity.keys()) - indexed
+
+
+def conforms(entity):
+    # Datastore does not say whether an empty list is indexed
+    empty = {name for name, value in entity.items() if value == []}
+    return set(entity.exclude_from_indexes) - empty == unindexed(entity) - empty
+
+
+def apply(*entities):
+    """Sets exclude_from_indexes on entities about to be written."""
+    for entity in entities:
+        if entity.key.kind in INDEXED:
+            entity.exclude_from_indexes = unindexed(entity)
+
+
+def migrate(kind, batch_size=BATCH_SIZE):
+    """
+    Rewrites the entities of kind whose indexed properties differ from the
+    schema, batch by batch. Each batch is read and written in a transaction,
+    so a write made while the migration runs is not lost, and entities that
+    already match are left alone, so the migration can be run again after
+    an interruption. Returns the numbers of entities scanned and rewritten.
+    """
+    client = db.client
+    query = client.query(kind=kind)
+    query.keys_only()
+
+    scanned = 0
+    rewritten = 0
+    keys = []
+
+    def rewrite(keys):
+        with client.transaction():
+            stale = [
+                entity for entity in client.get_multi(keys) if not conforms(entity)
+            ]
+            if stale:
+                client.put_multi(stale)
+        return len(stale)
+
+    for entity in query.fetch():
+        keys.append(entity.key)
+        if len(keys) >= batch_size:
+            rewritten += rewrite(keys)
+            scanned += len(keys)
+            keys = []
+
+    if keys:
+        rewritten += rewrite(keys)
+        scanned += len(keys)
+
+    return scanned, rewritten
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the index schema")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--kind", action="append", choices=sorted(INDEXED))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for kind in args.kind or sorted(INDEXED):
+            scanned, rewritten = migrate(kind, args.batch_size)
+            print(f"{kind}: rewrote {rewritten} of {scanned} entities")
+
+
+if __name__ == "__main__":
+    main()
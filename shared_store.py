@@ -0,0 +1,41 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Optional Redis connection shared by multi-instance backends
+"""
+
+import threading
+from os import environ as env
+
+from dotenv import find_dotenv, load_dotenv
+
+ENV_FILE = find_dotenv()
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
+
+REDIS_URL = env.get("REDIS_URL")
+
+_redis = None
+_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    Returns the shared Redis client, or None when REDIS_URL is not set.
+    The redis package is only required when a shared backend is configured.
+    """
+    global _redis
+
+    if not REDIS_URL:
+        return None
+
+    if _redis is None:
+        with _lock:
+            if _redis is None:
+                import redis
+
+                _redis = redis.Redis.from_url(REDIS_URL)
+
+    return _redis
@@ -0,0 +1,58 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Coalesces concurrent identical calls into one
+"""
+
+import threading
+
+import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """
+    Runs at most one call per key at a time in this process. Callers that
+    ask for a key while its call is in flight wait for it and share its
+    result or exception instead of making their own call. The result is
+    shared as is, so callers must not mutate it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr(f"singleflight.{self.name}.calls")
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
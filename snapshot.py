@@ -0,0 +1,426 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Serves product reads from a memory-mapped catalog snapshot shared by the worker processes
+# Usage: python snapshot.py build [--path PATH]
+"""
+
+import argparse
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from os import environ as env
+
+import catalog
+import constants
+import db
+import json_provider
+import metrics
+import models
+import numpy as np
+
+PRODUCTS = constants.products
+PRODUCT_TOMBSTONES = constants.product_tombstones
+CHECK_INTERVAL = constants.snapshot_check_interval
+MIN_AGE = constants.snapshot_min_age
+MAX_AGE = constants.snapshot_max_age
+SETTLE_TIME = constants.changes_settle_time
+
+# Snapshots are off unless CATALOG_SNAPSHOT names the file to share them in.
+# All the worker processes of an instance must be given the same path.
+PATH = env.get("CATALOG_SNAPSHOT")
+
+MAGIC = b"CMSNAP01"
+# Magic, number of products, version the snapshot is complete up to, and
+# size of the string heap
+HEADER = struct.Struct("<8sqqq")
+
+# The columns, one value per product in id order, except offsets, which
+# holds where the name, description and other properties of each product
+# start in the heap, and where the last one ends. Readers view them with
+# memoryview formats, in the byte order of the machine that wrote them.
+COLUMNS = [
+    ("ids", "q"),
+    ("versions", "q"),
+    ("prices", "d"),
+    ("stock", "q"),
+    ("flags", "B"),
+    ("offsets", "q"),
+]
+STRINGS = 3
+
+# The price was an integer
+PRICE_INT = 1
+# The product has values the columns cannot hold; it is read from Datastore
+FALLBACK = 2
+
+# The properties with a column of their own; the others are kept as JSON
+COLUMN_PROPERTIES = {"name", "description", "price", "stock", "updatedAt"}
+
+client = db.client
+loads = json_provider.orjson.loads if json_provider.orjson else json.loads
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _encode(product):
+    """A product as (version, price, stock, flags, strings)."""
+    name = product.get("name")
+    description = product.get("description")
+    price = product.get("price")
+    stock = product.get("stock")
+    updated_at = product.get("updatedAt")
+    if not (
+        isinstance(name, str)
+        and isinstance(description, str)
+        and type(price) in (int, float)
+        and abs(price) < 2**53
+        and type(stock) is int
+        and updated_at is not None
+    ):
+        return 0, 0.0, 0, FALLBACK, (b"", b"", b"")
+
+    other = {
+        key: value for key, value in product.items() if key not in COLUMN_PROPERTIES
+    }
+    strings = (
+        name.encode(),
+        description.encode(),
+        json.dumps(other, default=json_provider.default).encode() if other else b"",
+    )
+    flags = PRICE_INT if type(price) is int else 0
+    return catalog.time_version(updated_at), float(price), stock, flags, strings
+
+
+def write(path, products, version):
+    """
+    Writes products to path as a snapshot complete up to version. The file
+    is written aside and renamed over path, so readers never see half of it.
+    """
+    products = sorted(products, key=lambda product: product.key.id)
+    count = len(products)
+    columns = {
+        name: np.empty(
+            STRINGS * count + 1 if name == "offsets" else count, np.dtype(code)
+        )
+        for name, code in COLUMNS
+    }
+    heap = bytearray()
+    for index, product in enumerate(products):
+        row_version, price, stock, flags, strings = _encode(product)
+        columns["ids"][index] = product.key.id
+        columns["versions"][index] = row_version
+        columns["prices"][index] = price
+        columns["stock"][index] = stock
+        columns["flags"][index] = flags
+        for field, string in enumerate(strings):
+            columns["offsets"][STRINGS * index + field] = len(heap)
+            heap += string
+    columns["offsets"][STRINGS * count] = len(heap)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, count, version, len(heap)))
+        for name, _ in COLUMNS:
+            file.write(b"\0" * (_align(file.tell()) - file.tell()))
+            file.write(columns[name].tobytes())
+        file.write(b"\0" * (_align(file.tell()) - file.tell()))
+        file.write(heap)
+    os.replace(temporary, path)
+
+
+class Snapshot:
+    """
+    A snapshot file mapped read-only. The columns are views of the mapping,
+    so every process reading the file shares the same pages of the page
+    cache instead of holding its own copy of the catalog.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.file_id = (stat.st_ino, stat.st_mtime_ns)
+
+        magic, self.count, self.version, heap_size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        for name, code in COLUMNS:
+            length = STRINGS * self.count + 1 if name == "offsets" else self.count
+            size = length * struct.calcsize(code)
+            offset = _align(offset)
+            setattr(self, name, view[offset : offset + size].cast(code))
+            offset += size
+        self._heap = _align(offset)
+        if self._heap + heap_size != len(self._mmap):
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self):
+        return self.count
+
+    def index(self, product_id):
+        """The row of a product, or None if the snapshot does not have it."""
+        index = bisect.bisect_left(self.ids, product_id)
+        if index < self.count and self.ids[index] == product_id:
+            return index
+        return None
+
+    def product(self, index):
+        """The product of a row, or None if it must be read from Datastore."""
+        flags = self.flags[index]
+        if flags & FALLBACK:
+            return None
+
+        start = STRINGS * index
+        name, description, other = (
+            self._mmap[
+                self._heap + self.offsets[field] : self._heap + self.offsets[field + 1]
+            ]
+            for field in range(start, start + STRINGS)
+        )
+        price = self.prices[index]
+        properties = {
+            "name": name.decode(),
+            "description": description.decode(),
+            "price": int(price) if flags & PRICE_INT else price,
+            "stock": self.stock[index],
+            "updatedAt": catalog.version_time(self.versions[index]),
+        }
+        if other:
+            properties.update(loads(other))
+        return models.Product.from_properties(self.ids[index], properties)
+
+
+def changed_since(version):
+    """The ids of the products written or deleted after version."""
+    changed = set()
+    for kind in (PRODUCTS, PRODUCT_TOMBSTONES):
+        query = client.query(kind=kind)
+        query.add_filter("updatedAt", ">", catalog.version_time(version))
+        query.keys_only()
+        changed.update(entity.key.id for entity in query.fetch())
+    return frozenset(changed)
+
+
+def build(path):
+    """
+    Scans the catalog into a new snapshot at path. Writes stamped up to
+    SETTLE_TIME before the scan may still be landing, so the snapshot only
+    claims to be complete up to then; later writes are read as stale.
+    """
+    started = time.perf_counter()
+    version = catalog.next_version() - SETTLE_TIME * 1_000_000
+    products = list(client.query(kind=PRODUCTS).fetch())
+    write(path, products, version)
+
+    metrics.observe("snapshot.build", time.perf_counter() - started)
+    metrics.incr("snapshot.builds")
+    return len(products)
+
+
+# The mapped snapshot and the ids changed since it, swapped together
+_state = (None, frozenset())
+# Ids written by this process, with the sequence number of the write; they
+# are dropped once a check that started after them has seen them
+_written = {}
+_sequence = 0
+_lock = threading.Lock()
+_started_pid = None
+
+
+@catalog.on_change
+def mark_written(products, deleted):
+    global _sequence
+
+    with _lock:
+        for product_id in [product.key.id for product in products] + list(deleted):
+            _sequence += 1
+            _written[product_id] = _sequence
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def maybe_build(path, snapshot, stale):
+    """
+    Rebuilds the snapshot when the catalog changed since it, at most every
+    MIN_AGE seconds, and at least every MAX_AGE seconds. Only one process
+    builds at a time; the others pick its file up on their next check.
+    """
+    if snapshot is not None:
+        age = (catalog.next_version() - snapshot.version) / 1_000_000
+        if age < MIN_AGE or (age < MAX_AGE and not stale):
+            return
+
+    with open(f"{path}.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+
+        # Another process may have built it while this one checked
+        current = snapshot.file_id if snapshot is not None else None
+        if _file_id(path) == current:
+            build(path)
+
+
+def refresh(path=PATH):
+    """
+    Maps the snapshot file if it was replaced, and finds what changed since
+    it. Reads never wait on this; they use the last state until it is done.
+    """
+    global _state
+
+    snapshot, stale = _state
+    file_id = _file_id(path)
+    if file_id is not None and (snapshot is None or snapshot.file_id != file_id):
+        snapshot = Snapshot(path)
+
+    if snapshot is not None:
+        with _lock:
+            sequence = _sequence
+        stale = changed_since(snapshot.version)
+        with _lock:
+            _state = (snapshot, stale)
+            for product_id, written in list(_written.items()):
+                if written <= sequence:
+                    del _written[product_id]
+
+        metrics.gauge("snapshot.products", len(snapshot))
+        metrics.gauge("snapshot.stale", len(stale))
+
+    maybe_build(path, snapshot, stale)
+
+
+def _run():
+    while True:
+        try:
+            refresh()
+        except Exception:
+            metrics.incr("snapshot.errors")
+        time.sleep(CHECK_INTERVAL)
+
+
+def _start():
+    """Starts the refresh thread once in each worker process."""
+    global _started_pid
+
+    if _started_pid == os.getpid():
+        return
+
+    with _lock:
+        if _started_pid != os.getpid():
+            _started_pid = os.getpid()
+            threading.Thread(target=_run, name="catalog-snapshot", daemon=True).start()
+
+
+def _current():
+    """The snapshot and the ids changed since it, or None without one."""
+    if not PATH:
+        return None
+
+    _start()
+    return _state if _state[0] is not None else None
+
+
+def _from_snapshot(current, product_id):
+    snapshot, stale = current
+    if product_id in stale or product_id in _written:
+        return None
+
+    index = snapshot.index(product_id)
+    return snapshot.product(index) if index is not None else None
+
+
+def get_product(product_id):
+    """Like catalog.get_product, from the snapshot when it is up to date."""
+    current = _current()
+    product = _from_snapshot(current, product_id) if current else None
+    if product is None:
+        metrics.incr("snapshot.misses")
+        return catalog.get_product(product_id)
+
+    metrics.incr("snapshot.hits")
+    return product
+
+
+def get_products(product_ids):
+    """Like catalog.get_products, from the snapshot when it is up to date."""
+    current = _current()
+    products = {}
+    misses = []
+    for product_id in product_ids:
+        product = _from_snapshot(current, product_id) if current else None
+        if product is None:
+            misses.append(product_id)
+        else:
+            products[product_id] = product
+
+    metrics.incr("snapshot.hits", len(products))
+    if misses:
+        metrics.incr("snapshot.misses", len(misses))
+        products.update(catalog.get_products(misses))
+    return products
+
+
+def list_products(limit, offset):
+    """
+    Like catalog.list_products. Pages come from the snapshot only while no
+    product changed since it, as a write may add or remove a product.
+    """
+    current = _current()
+    if not current or current[1] or _written or limit <= 0 or offset < 0:
+        metrics.incr("snapshot.pages.misses")
+        return catalog.list_products(limit, offset)
+
+    snapshot, _ = current
+    rows = range(offset, min(offset + limit, len(snapshot)))
+    products = [snapshot.product(index) for index in rows]
+    fallbacks = [
+        snapshot.ids[index] for index, product in zip(rows, products) if product is None
+    ]
+    if fallbacks:
+        found = catalog.get_products(fallbacks)
+        products = [
+            product or found.get(snapshot.ids[index])
+            for index, product in zip(rows, products)
+        ]
+
+    metrics.incr("snapshot.pages.hits")
+    return (
+        [product for product in products if product is not None],
+        len(snapshot),
+        offset + limit < len(snapshot),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the catalog snapshot")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--path", default=PATH, required=not PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build(args.path)
+        print(f"Wrote {count} products to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Cancels pending orders that were abandoned and releases their stock
+"""
+
+import datetime
+import threading
+import time
+from os import environ as env
+
+import analytics
+import catalog
+import constants
+import db
+import metrics
+import order
+from flask import Blueprint, jsonify, request
+from google.api_core import exceptions
+from verifyJWT import AuthError, verify_admin
+
+PROJECT_ID = constants.project_id
+ORDERS = constants.orders
+PENDING_ORDER_TTL = constants.pending_order_ttl
+SWEEP_LIMIT = constants.sweep_limit
+SWEEP_INTERVAL = constants.sweep_interval
+TASK_DEADLINE = constants.task_deadline
+
+# App Engine strips X-Appengine-Cron from requests that do not come from
+# cron; anywhere else a client could send it
+ON_APP_ENGINE = bool(env.get("GAE_ENV") or env.get("GAE_APPLICATION"))
+
+bp = Blueprint("sweeper", __name__, url_prefix="/tasks")
+client = db.client
+
+
+def stale_order_batches(cutoff, limit=SWEEP_LIMIT):
+    """
+    Finds pending orders last modified before cutoff and groups their keys
+    so that canceling a group stays under the write limit of a transaction.
+    """
+    query = client.query(kind=ORDERS)
+    query.add_filter("status", "=", "pending")
+    query.add_filter("dateModified", "<", cutoff)
+    return order.order_batches(query.fetch(limit=limit))
+
+
+def sweep(ttl=PENDING_ORDER_TTL, limit=SWEEP_LIMIT):
+    """
+    Cancels up to limit pending orders that were not modified for ttl
+    seconds, returning their quantities to stock. Each batch is its own
+    transaction, and an order changed since it was found is left alone.
+    """
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        seconds=ttl
+    )
+
+    canceled = 0
+    conflicts = 0
+    errors = 0
+    for keys in stale_order_batches(cutoff, limit):
+        try:
+            orders, befores, products = order.cancel_stale_orders(keys, cutoff)
+        except (exceptions.Aborted, exceptions.Conflict):
+            # Another request wrote one of the entities; the next run retries
+            conflicts += 1
+            continue
+        except Exception:
+            # A batch that cannot be canceled must not hold back the others
+            errors += 1
+            continue
+
+        catalog.notify(*products)
+        analytics.record_order_changes(
+            zip(befores, [analytics.order_snapshot(item) for item in orders])
+        )
+        canceled += len(orders)
+
+    metrics.incr("sweeper.canceled", canceled)
+    metrics.incr("sweeper.conflicts", conflicts)
+    metrics.incr("sweeper.errors", errors)
+    return {"canceled": canceled, "conflicts": conflicts, "errors": errors}
+
+
+def start(interval=SWEEP_INTERVAL):
+    """Runs the sweeper every interval seconds in a daemon thread."""
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                sweep()
+            except Exception:
+                metrics.incr("sweeper.errors")
+
+    thread = threading.Thread(target=run, name="sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+@bp.route("/sweep-pending-orders", methods=["GET"])
+def sweep_get():
+    """
+    Run the sweeper; called by App Engine cron or by an admin
+    """
+    if not (ON_APP_ENGINE and request.headers.get("X-Appengine-Cron") == "true"):
+        try:
+            verify_admin(request)
+        except AuthError as e:
+            return jsonify(e.error), e.status_code
+
+    db.set_deadline(TASK_DEADLINE)
+    return jsonify(sweep()), 200
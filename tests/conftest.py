@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Runs db.client on the in-memory store instead of Datastore
+os.environ.setdefault("DATASTORE_BACKEND", "memory")
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    """A fresh in-memory store behind db.client, which every module shares."""
+    import db
+    import fake_datastore
+
+    store = fake_datastore.Client(project=db.PROJECT_ID)
+    monkeypatch.setattr(db.client, "client", store)
+    return store
+
+
+@pytest.fixture
+def api(monkeypatch, memory_store):
+    """A test client of the app that takes "Bearer <sub>" as a valid token."""
+    import main
+    import verifyJWT
+
+    monkeypatch.setattr(verifyJWT.jwks_flights, "do", lambda key, fn: {})
+    monkeypatch.setattr(verifyJWT, "decode_token", lambda token, jwks: {"sub": token})
+    main.app.testing = True
+    return main.app.test_client()
@@ -0,0 +1,79 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests the daily sales rollups against the in-memory store
+"""
+
+import datetime
+
+import analytics
+import db
+import metrics
+import pytest
+from google.cloud import datastore
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(db, "BACKOFF", 0)
+
+
+def yesterday():
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
+
+
+def add_order(store, status="pending", total=10.0):
+    order = datastore.Entity(key=store.key("users", "auth0|1", "orders"))
+    order.update({"status": status, "total": total, "dateCreated": yesterday()})
+    store.put(order)
+    return order
+
+
+def test_rollup_is_not_stored_if_an_order_changed_during_the_scan(
+    monkeypatch, memory_store
+):
+    order = add_order(memory_store)
+    day = analytics.order_day(yesterday())
+    scan_orders = analytics.scan_orders
+
+    def scan_then_cancel(*args):
+        scanned = scan_orders(*args)
+        before = analytics.order_snapshot(order)
+        order["status"] = "canceled"
+        memory_store.put(order)
+        analytics.record_order_change(before, analytics.order_snapshot(order))
+        return scanned
+
+    monkeypatch.setattr(analytics, "scan_orders", scan_then_cancel)
+    assert analytics.sales_between(day, day)[day]["orders"] == 1
+    assert "sales" not in memory_store.get(analytics._rollup_key(day))
+    assert metrics.counter("analytics.rollups_skipped") == 1
+
+    monkeypatch.setattr(analytics, "scan_orders", scan_orders)
+    assert analytics.sales_between(day, day)[day]["orders"] == 0
+    assert analytics.sales_between(day, day)[day]["statuses"] == {"canceled": [1, 10.0]}
+    assert "sales" in memory_store.get(analytics._rollup_key(day))
+
+
+def test_rollup_is_updated_by_later_changes(memory_store):
+    order = add_order(memory_store)
+    day = analytics.order_day(yesterday())
+    analytics.sales_between(day, day)
+
+    before = analytics.order_snapshot(order)
+    order["total"] = 25.0
+    analytics.record_order_change(before, analytics.order_snapshot(order))
+    assert analytics.sales_between(day, day)[day]["total"] == 25.0
+
+
+def test_failed_rollup_update_is_counted_not_raised(memory_store):
+    order = add_order(memory_store)
+    day = analytics.order_day(yesterday())
+    analytics.sales_between(day, day)
+
+    memory_store.failure_rate = 1.0
+    analytics.record_order_change(None, analytics.order_snapshot(order))
+    assert metrics.counter("analytics.rollup_errors") == 1
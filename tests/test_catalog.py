@@ -0,0 +1,73 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests the catalog change feed against the in-memory store
+"""
+
+import catalog
+import pytest
+from google.cloud import datastore
+
+
+@pytest.fixture(autouse=True)
+def settled(monkeypatch):
+    # Lists writes as soon as they are made
+    monkeypatch.setattr(catalog, "SETTLE_TIME", 0)
+
+
+def write_product(store, product_id):
+    product = datastore.Entity(key=store.key("products", product_id))
+    product.update({"name": "p", "price": 1.0, "stock": 1})
+    catalog.stamp(product)
+    store.put(product)
+
+
+def delete_product(store, product_id):
+    store.delete(store.key("products", product_id))
+    store.put(catalog.tombstone(product_id))
+
+
+def read_all(limit):
+    """Pages through the changes from the start, as a syncing client does."""
+    position = (0, 0)
+    pages = []
+    while True:
+        changed, deleted, position, more = catalog.changes_since(position, limit)
+        pages.append((changed, deleted))
+        if not more:
+            return pages, position
+
+
+def test_cursor_pages_through_products_and_tombstones_in_order(memory_store):
+    for product_id in range(1, 6):
+        write_product(memory_store, product_id)
+    delete_product(memory_store, 2)
+    write_product(memory_store, 1)
+    delete_product(memory_store, 4)
+
+    pages, position = read_all(limit=2)
+
+    # 2 and 4 are listed as deleted, and 1 at its second write only
+    assert pages == [([3, 5], []), ([1], [2]), ([], [4])]
+    assert catalog.changes_since(position, 2)[:2] == ([], [])
+
+
+def test_cursor_lists_later_writes_once(memory_store):
+    write_product(memory_store, 1)
+    write_product(memory_store, 2)
+    _, position = read_all(limit=10)
+
+    write_product(memory_store, 1)
+    delete_product(memory_store, 2)
+    changed, deleted, position, more = catalog.changes_since(position, 10)
+    assert (changed, deleted, more) == ([1], [2], False)
+    assert catalog.changes_since(position, 10)[:2] == ([], [])
+
+
+def test_writes_younger_than_the_settle_time_are_not_listed(monkeypatch, memory_store):
+    monkeypatch.setattr(catalog, "SETTLE_TIME", 60)
+    write_product(memory_store, 1)
+
+    assert catalog.changes_since((0, 0), 10)[:2] == ([], [])
@@ -0,0 +1,165 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests the deadline, retry and hedge policy of db.PolicyClient against the in-memory store
+"""
+
+import time
+
+import db
+import fake_datastore
+import metrics
+import pytest
+from flask import Flask
+from google.cloud import datastore
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    # Hedge delays come from the timers, so each test starts without any
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_timers", {})
+    monkeypatch.setattr(db, "BACKOFF", 0)
+
+
+@pytest.fixture
+def store():
+    return fake_datastore.Client(project="test")
+
+
+@pytest.fixture
+def key(store):
+    entity = datastore.Entity(key=store.key("products", 1))
+    entity["name"] = "p"
+    store.put(entity)
+    store.calls = 0
+    return entity.key
+
+
+def fail_first(monkeypatch, calls):
+    """Makes the first calls of the store fail and the next ones succeed."""
+    draws = iter([0.0] * calls)
+    monkeypatch.setattr(fake_datastore.random, "random", lambda: next(draws, 1.0))
+
+
+def test_read_is_retried_after_a_transient_error(monkeypatch, store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+    store.failure_rate = 1.0
+    fail_first(monkeypatch, db.READ_RETRIES)
+
+    assert client.get(key)["name"] == "p"
+    assert store.calls == db.READ_RETRIES + 1
+    assert metrics.counter("datastore.get.retries") == db.READ_RETRIES
+
+
+def test_read_fails_once_its_retries_are_spent(store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+    store.failure_rate = 1.0
+
+    with pytest.raises(db.DatastoreUnavailable):
+        client.get(key)
+    assert store.calls == db.READ_RETRIES + 1
+
+
+def test_read_in_a_transaction_is_not_retried(store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+    store.failure_rate = 1.0
+
+    with pytest.raises(db.DatastoreUnavailable):
+        with client.transaction():
+            client.get(key)
+    assert store.calls == 1
+
+
+def test_write_is_not_retried(monkeypatch, store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+    store.failure_rate = 1.0
+    fail_first(monkeypatch, 1)
+
+    with pytest.raises(db.DatastoreUnavailable):
+        client.put(datastore.Entity(key=key))
+    assert store.calls == 1
+
+
+def test_slow_read_is_hedged_at_the_p95_delay(store, key):
+    client = db.PolicyClient(store)
+    for _ in range(db.HEDGE_MIN_SAMPLES):
+        metrics.observe("datastore.get", 0.05)
+
+    # The first read hangs; the hedge sent after the p95 answers at once
+    latencies = iter([1.0])
+    store.latency = lambda: next(latencies, 0.0)
+    started = time.monotonic()
+    assert client.get(key)["name"] == "p"
+    elapsed = time.monotonic() - started
+
+    assert 0.05 <= elapsed < 0.5
+    assert store.calls == 2
+    assert metrics.counter("datastore.get.hedged") == 1
+    assert metrics.counter("datastore.get.hedge_won") == 1
+
+
+def test_read_faster_than_the_p95_is_not_hedged(store, key):
+    client = db.PolicyClient(store)
+    for _ in range(db.HEDGE_MIN_SAMPLES):
+        metrics.observe("datastore.get", 0.05)
+
+    store.latency = 0.01
+    assert client.get(key)["name"] == "p"
+    assert store.calls == 1
+    assert metrics.counter("datastore.get.hedged") == 0
+
+
+def test_read_is_not_hedged_without_enough_samples(store, key):
+    client = db.PolicyClient(store)
+    store.latency = 0.05
+
+    client.get(key)
+    assert store.calls == 1
+
+
+def test_deadline_cuts_a_call_short(store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+    store.latency = 1.0
+
+    with Flask(__name__).test_request_context():
+        db.set_deadline(0.05)
+        started = time.monotonic()
+        with pytest.raises(db.DatastoreUnavailable):
+            client.get(key)
+        elapsed = time.monotonic() - started
+
+    # The call timed out with the deadline, and left no time for a retry
+    assert elapsed < 0.5
+    assert store.calls == 1
+
+
+def test_deadline_already_spent_makes_no_call(store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+
+    with Flask(__name__).test_request_context():
+        db.set_deadline(0)
+        with pytest.raises(db.DatastoreUnavailable):
+            client.put(datastore.Entity(key=key))
+
+    assert store.calls == 0
+
+
+def test_unavailable_datastore_is_a_503(monkeypatch, store, key):
+    client = db.PolicyClient(store, hedge_reads=False)
+    store.latency = 1.0
+    monkeypatch.setattr(db, "REQUEST_DEADLINE", 0.05)
+
+    app = Flask(__name__)
+    db.init_app(app)
+
+    @app.route("/product")
+    def product_get():
+        return {"name": client.get(key)["name"]}
+
+    response = app.test_client().get("/product")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json == {"Error": "The database is unavailable, try again later"}
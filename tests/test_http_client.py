@@ -0,0 +1,110 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests the circuit breaker of outbound HTTP calls
+"""
+
+import time
+from types import SimpleNamespace
+
+import http_client
+import pytest
+import requests
+
+URL = "https://auth.example.com/.well-known/jwks.json"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Reply:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    fake_time = SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter)
+    monkeypatch.setattr(http_client, "time", fake_time)
+    return clock
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    breaker = http_client.CircuitBreaker("auth", threshold=2, reset_timeout=30)
+    monkeypatch.setattr(http_client, "_breakers", {"auth.example.com": breaker})
+    return breaker
+
+
+def send_with(*outcomes):
+    """A send function that returns or raises the outcomes in turn."""
+    outcomes = list(outcomes)
+
+    def send(method, url, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Reply(outcome)
+
+    return send
+
+
+def open_circuit(breaker):
+    for _ in range(breaker.threshold):
+        with pytest.raises(requests.ConnectionError):
+            http_client._send(send_with(requests.ConnectionError()), "GET", URL)
+
+
+def test_opens_after_the_threshold_and_fails_fast(breaker):
+    open_circuit(breaker)
+    assert breaker.state == "open"
+
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client._send(send_with(200), "GET", URL)
+
+
+def test_half_open_lets_one_trial_through(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 30
+    assert breaker.state == "half-open"
+
+    breaker.before_call()
+    with pytest.raises(http_client.CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes_the_circuit(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 30
+
+    assert http_client._send(send_with(200), "GET", URL).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_opens_the_circuit_again(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 30
+
+    assert http_client._send(send_with(503), "GET", URL).status_code == 503
+    assert breaker.state == "open"
+
+
+def test_trial_ending_in_any_exception_is_settled(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 30
+
+    with pytest.raises(ValueError):
+        http_client._send(send_with(ValueError("bad body")), "GET", URL)
+    assert not breaker.trial_running
+
+    clock.now += 30
+    assert http_client._send(send_with(200), "GET", URL).status_code == 200
+    assert breaker.state == "closed"
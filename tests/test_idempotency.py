@@ -0,0 +1,148 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests Idempotency-Key replays against the in-memory store
+"""
+
+import threading
+
+import idempotency
+import pytest
+from flask import Flask, jsonify, request
+from idempotency import idempotent
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(idempotency, "cache", idempotency.ResponseCache(16))
+
+
+@pytest.fixture
+def app(memory_store):
+    """An app with one idempotent route that answers with the status asked."""
+    app = Flask(__name__)
+    app.calls = []
+    app.hold = None
+
+    @app.route("/things", methods=["POST"])
+    @idempotent("POST")
+    def things():
+        app.calls.append(request.get_json())
+        if app.hold:
+            app.hold()
+        status = request.get_json().get("status", 201)
+        return jsonify({"call": len(app.calls)}), status
+
+    return app
+
+
+def post(app, body, key="key-1", caller="Bearer auth0|1"):
+    return app.test_client().post(
+        "/things",
+        json=body,
+        headers={"Idempotency-Key": key, "Authorization": caller},
+    )
+
+
+def test_retry_replays_the_first_response(app):
+    first = post(app, {"name": "a"})
+    retry = post(app, {"name": "a"})
+
+    assert (first.status_code, retry.status_code) == (201, 201)
+    assert retry.json == first.json == {"call": 1}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(app.calls) == 1
+
+
+def test_stored_response_is_replayed_without_the_local_cache(monkeypatch, app):
+    post(app, {"name": "a"})
+    monkeypatch.setattr(idempotency, "cache", idempotency.ResponseCache(16))
+
+    retry = post(app, {"name": "a"})
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(app.calls) == 1
+
+
+def test_key_reused_for_another_request_is_rejected(app):
+    post(app, {"name": "a"})
+
+    response = post(app, {"name": "b"})
+    assert response.status_code == 422
+    assert len(app.calls) == 1
+
+
+def test_key_is_scoped_to_the_caller(app):
+    post(app, {"name": "a"})
+
+    response = post(app, {"name": "a"}, caller="Bearer auth0|2")
+    assert "Idempotent-Replayed" not in response.headers
+    assert len(app.calls) == 2
+
+
+def test_server_error_is_not_stored(app):
+    failed = post(app, {"status": 503})
+    assert failed.status_code == 503
+
+    retry = post(app, {"status": 503})
+    assert "Idempotent-Replayed" not in retry.headers
+    assert len(app.calls) == 2
+
+
+def test_duplicate_waits_for_the_request_in_flight(monkeypatch, app):
+    entered = threading.Event()
+    release = threading.Event()
+    waiting = threading.Event()
+
+    def hold():
+        entered.set()
+        release.wait(5)
+
+    app.hold = hold
+    acquire = idempotency._acquire
+
+    def spy(scoped):
+        event = acquire(scoped)
+        if event is not None:
+            waiting.set()
+        return event
+
+    monkeypatch.setattr(idempotency, "_acquire", spy)
+
+    responses = {}
+    first = threading.Thread(
+        target=lambda: responses.setdefault("first", post(app, {"name": "a"}))
+    )
+    first.start()
+    assert entered.wait(5)
+
+    duplicate = threading.Thread(
+        target=lambda: responses.setdefault("duplicate", post(app, {"name": "a"}))
+    )
+    duplicate.start()
+    assert waiting.wait(5)
+
+    release.set()
+    first.join(5)
+    duplicate.join(5)
+
+    assert len(app.calls) == 1
+    assert responses["duplicate"].json == responses["first"].json
+    assert responses["duplicate"].headers["Idempotent-Replayed"] == "true"
+
+
+def test_order_post_is_created_once(api, memory_store):
+    headers = {
+        "Accept": "application/json",
+        "Authorization": "Bearer auth0|1",
+        "Idempotency-Key": "order-1",
+    }
+    body = {"billingAddress": "1 Main St", "paymentMethod": "cash"}
+
+    first = api.post("/orders", json=body, headers=headers)
+    retry = api.post("/orders", json=body, headers=headers)
+
+    assert retry.json["id"] == first.json["id"]
+    query = memory_store.query(kind="orders")
+    assert len(list(query.fetch())) == 1
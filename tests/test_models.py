@@ -0,0 +1,64 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests the conversion of models from and to entities
+"""
+
+import datetime
+
+import models
+from google.cloud import datastore
+
+
+def make_order(sub="auth0|1", order_id=7):
+    order = datastore.Entity(
+        key=datastore.Key("users", sub, "orders", order_id, project=models.PROJECT_ID)
+    )
+    line = datastore.Entity(key=datastore.Key("products", 3, project=models.PROJECT_ID))
+    line.update({"id": 3, "name": "p", "price": 2.5, "quantity": 2, "stock": 1})
+    order.update(
+        {
+            "products": [line],
+            "total": 5.0,
+            "status": "pending",
+            "billingAddress": "1 Main St",
+            "dateCreated": datetime.datetime(2026, 1, 2),
+            "note": "kept",
+        }
+    )
+    return order
+
+
+def test_order_round_trip_keeps_its_parent_lines_and_unknown_properties():
+    order = make_order()
+    model = models.Order.from_entity(order)
+    assert model.user_id == "auth0|1"
+    assert model.products[0].id == 3
+    assert model.products[0].extra == {"stock": 1}
+
+    entity = model.to_entity()
+    assert entity.key.flat_path == ("users", "auth0|1", "orders", 7)
+    assert dict(entity) == dict(order)
+
+
+def test_new_order_gets_a_partial_key_under_its_user():
+    model = models.Order(user_id="auth0|1", total=0, status="pending")
+    entity = model.to_entity()
+    assert entity.key.is_partial
+    assert entity.key.parent.name == "auth0|1"
+    assert dict(entity) == {"total": 0, "status": "pending"}
+
+
+def test_user_response_has_its_orders_as_dicts():
+    user = datastore.Entity(
+        key=datastore.Key("users", "auth0|1", project=models.PROJECT_ID)
+    )
+    user.update({"name": "Ada", "email": None, "orders": [make_order()]})
+
+    result = models.User.from_entity(user).to_dict("https://example.com/users/1")
+    assert result["id"] == "auth0|1"
+    assert result["self"] == "https://example.com/users/1"
+    assert result["orders"] == [dict(make_order())]
+    assert type(result["orders"][0]["products"][0]) is dict
@@ -0,0 +1,73 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests the order endpoints against the in-memory store
+"""
+
+from google.cloud import datastore
+
+HEADERS = {"Accept": "application/json", "Authorization": "Bearer auth0|1"}
+
+
+def add_product(store, stock=10, price=2.5):
+    product = datastore.Entity(key=store.key("products"))
+    product.update(
+        {"name": "p", "description": "d", "price": price, "stock": stock, "orders": []}
+    )
+    store.put(product)
+    return product.key.id
+
+
+def test_batch_changes_an_order_created_by_the_api(api, memory_store):
+    kept = add_product(memory_store)
+    removed = add_product(memory_store)
+    response = api.post(
+        "/orders",
+        json={"billingAddress": "1 Main St", "paymentMethod": "cash"},
+        headers=HEADERS,
+    )
+    assert response.status_code == 201
+    order_id = response.json["id"]
+
+    response = api.post(
+        f"/orders/{order_id}/products:batch",
+        json=[
+            {"productId": kept, "quantity": 2},
+            {"productId": removed, "quantity": 1},
+        ],
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json["results"]] == [204, 204]
+    assert response.json["total"] == 7.5
+
+    response = api.post(
+        f"/orders/{order_id}/products:batch",
+        json=[{"productId": removed, "remove": True}, {"productId": 0, "quantity": 1}],
+        headers=HEADERS,
+    )
+    assert [result["status"] for result in response.json["results"]] == [204, 404]
+    assert response.json["total"] == 5.0
+
+    order = memory_store.get(memory_store.key("users", "auth0|1", "orders", order_id))
+    assert [line["id"] for line in order["products"]] == [kept]
+    assert memory_store.get(memory_store.key("products", kept))["stock"] == 8
+    assert memory_store.get(memory_store.key("products", removed))["stock"] == 10
+
+
+def test_batch_does_not_find_the_order_of_another_user(api, memory_store):
+    product = add_product(memory_store)
+    order_id = api.post(
+        "/orders",
+        json={"billingAddress": "1 Main St", "paymentMethod": "cash"},
+        headers=HEADERS,
+    ).json["id"]
+
+    response = api.post(
+        f"/orders/{order_id}/products:batch",
+        json=[{"productId": product, "quantity": 1}],
+        headers={**HEADERS, "Authorization": "Bearer auth0|2"},
+    )
+    assert response.status_code == 404
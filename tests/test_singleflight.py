@@ -0,0 +1,89 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests that singleflight coalesces concurrent identical calls
+"""
+
+import threading
+import time
+
+import metrics
+import pytest
+import singleflight
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_counters", {})
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def run_together(group, fn, callers=8):
+    """
+    Starts callers of the same key while the first call is held, and
+    returns what each of them got, results or exceptions.
+    """
+    release = threading.Event()
+    outcomes = []
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    def call():
+        try:
+            outcomes.append(group.do("key", held))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+
+    wait_for(
+        lambda: metrics.counter(f"singleflight.{group.name}.coalesced") == callers - 1
+    )
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_call():
+    group = singleflight.Group("test")
+    calls = []
+
+    outcomes = run_together(group, lambda: calls.append(1) or {"value": 1})
+
+    assert len(calls) == 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+    assert metrics.counter("singleflight.test.calls") == 1
+
+
+def test_concurrent_callers_share_the_exception():
+    group = singleflight.Group("test")
+    error = ValueError("boom")
+
+    def fail():
+        raise error
+
+    outcomes = run_together(group, fail)
+    assert all(outcome is error for outcome in outcomes)
+
+
+def test_key_is_called_again_once_its_call_ended():
+    group = singleflight.Group("test")
+
+    assert group.do("key", lambda: 1) == 1
+    with pytest.raises(ValueError):
+        group.do("key", lambda: int("x"))
+    assert group.do("key", lambda: 2) == 2
+    assert metrics.counter("singleflight.test.calls") == 3
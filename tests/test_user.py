@@ -0,0 +1,39 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Tests user provisioning against the in-memory store
+"""
+
+from collections import OrderedDict
+
+import pytest
+import user
+
+
+@pytest.fixture(autouse=True)
+def no_known_users(monkeypatch):
+    monkeypatch.setattr(user, "_known", OrderedDict())
+
+
+def test_user_from_an_access_token_gets_its_name_and_email_later(memory_store):
+    key = memory_store.key("users", "auth0|1")
+
+    user.ensure_user({"sub": "auth0|1"})
+    assert memory_store.get(key)["name"] is None
+    assert "auth0|1" not in user._known
+
+    user.ensure_user({"sub": "auth0|1", "name": "Ada", "email": "ada@example.com"})
+    stored = memory_store.get(key)
+    assert (stored["name"], stored["email"]) == ("Ada", "ada@example.com")
+    assert stored["orders"] == []
+    assert "auth0|1" in user._known
+
+
+def test_known_user_is_not_read_again(memory_store):
+    user.ensure_user({"sub": "auth0|1", "name": "Ada", "email": "ada@example.com"})
+    memory_store.calls = 0
+
+    user.ensure_user({"sub": "auth0|1"})
+    assert memory_store.calls == 0
@@ -0,0 +1,83 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Times the phases of profiled requests for their Server-Timing header
+"""
+
+import contextlib
+import time
+from collections import Counter
+
+from flask import g, has_request_context
+
+# The phases reported, in order; the rest of a request is its handler code
+PHASES = ("jwt", "datastore", "serialization")
+
+
+def start():
+    """Starts timing the phases of the current request."""
+    g.timings = Counter()
+    g.timing_calls = Counter()
+    g.timing_started = time.perf_counter()
+
+
+def _timings():
+    if has_request_context():
+        return g.get("timings")
+    return None
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Adds the time spent in the block to a phase of the current request, if
+    it is timed. A phase entered inside another is counted once, in the
+    outer one.
+    """
+    timings = _timings()
+    if timings is None or g.get("timing_phase"):
+        yield
+        return
+
+    g.timing_phase = name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] += time.perf_counter() - started
+        g.timing_calls[name] += 1
+        g.timing_phase = None
+
+
+def timed(name, func):
+    """Wraps func so that its calls count towards a phase."""
+
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def finish():
+    """
+    Stops timing the current request and returns its Server-Timing header
+    value, or None if it was not timed.
+    """
+    timings = g.pop("timings", None)
+    if timings is None:
+        return None
+
+    calls = g.pop("timing_calls")
+    total = time.perf_counter() - g.pop("timing_started")
+    handler = max(0.0, total - sum(timings.values()))
+
+    entries = []
+    for name in PHASES:
+        desc = f"{calls[name]} call" + ("" if calls[name] == 1 else "s")
+        entries.append(f'{name};dur={timings[name] * 1000:.2f};desc="{desc}"')
+    entries.append(f"handler;dur={handler * 1000:.2f}")
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
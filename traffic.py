@@ -0,0 +1,295 @@
+"""
+# Author: Jack Huang
+# GitHub username: jackplus-xyz
+# Created:  10-19-2026
+# Modified: 10-19-2026
+# Description: Captures a sample of API traffic to JSONL and replays it as a load test
+# Usage: python traffic.py replay <file> --target <url> [--concurrency N] [--rate R]
+"""
+
+import argparse
+import hashlib
+import json
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+from os import environ as env
+
+import constants
+import metrics
+import requests
+from dotenv import find_dotenv, load_dotenv
+from flask import g, request
+from jose import jwt
+
+ENV_FILE = find_dotenv()
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
+
+# Captures are off unless TRAFFIC_CAPTURE names the file to append them to
+CAPTURE_PATH = env.get("TRAFFIC_CAPTURE")
+SAMPLE_RATE = float(env.get("TRAFFIC_SAMPLE_RATE", constants.capture_sample_rate))
+MAX_BODY_SIZE = constants.capture_max_body_size
+QUEUE_SIZE = constants.capture_queue_size
+
+# Login and callback carry credentials, and debug and task endpoints are not
+# part of the load, so only the API blueprints are captured
+CAPTURED_BLUEPRINTS = {"user", "product", "order", "inventory", "analytics"}
+CAPTURED_HEADERS = ["Accept", "Accept-Encoding", "Content-Type", "Idempotency-Key"]
+
+
+def anonymize(auth_header):
+    """
+    Replaces an Authorization header with a stable pseudonym of its sub, so
+    that captures keep who made which request without holding any token.
+    """
+    parts = auth_header.split()
+    if len(parts) != 2:
+        return None
+
+    try:
+        sub = jwt.get_unverified_claims(parts[1]).get("sub") or ""
+    except jwt.JWTError:
+        sub = ""
+
+    return "user-" + hashlib.sha256(sub.encode()).hexdigest()[:12]
+
+
+class CaptureWriter:
+    """
+    Appends captured requests to a JSONL file from a background thread.
+    Requests never wait on the file: when the queue is full, the capture is
+    dropped and counted.
+    """
+
+    def __init__(self, path, maxsize=QUEUE_SIZE):
+        self.path = path
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(
+            target=self._run, name="traffic-capture", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("traffic.dropped")
+
+    def _run(self):
+        with open(self.path, "a", buffering=1) as file:
+            while True:
+                record = self._queue.get()
+                file.write(json.dumps(record) + "\n")
+                metrics.incr("traffic.captured")
+
+
+_writer = None
+
+
+def _start_capture():
+    if request.blueprint in CAPTURED_BLUEPRINTS and random.random() < SAMPLE_RATE:
+        g.capture_started = time.perf_counter()
+
+
+def _capture(response):
+    started = g.pop("capture_started", None)
+    if started is None:
+        return response
+
+    body = request.get_data(cache=True)
+    record = {
+        "time": time.time(),
+        "method": request.method,
+        "path": request.path,
+        "query": request.query_string.decode(),
+        "route": request.url_rule.rule,
+        "headers": {
+            name: request.headers[name]
+            for name in CAPTURED_HEADERS
+            if name in request.headers
+        },
+        "body": body.decode("utf-8", "replace") if len(body) <= MAX_BODY_SIZE else None,
+        "user": anonymize(request.headers.get("Authorization", "")),
+        "status": response.status_code,
+        "durationMs": round((time.perf_counter() - started) * 1000, 3),
+    }
+    _writer.write(record)
+    return response
+
+
+def init_app(app):
+    """Captures a sample of the requests when TRAFFIC_CAPTURE is set."""
+    global _writer
+
+    if not CAPTURE_PATH or SAMPLE_RATE <= 0:
+        return
+
+    _writer = CaptureWriter(CAPTURE_PATH)
+    app.before_request(_start_capture)
+    app.after_request(_capture)
+
+
+def load_records(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def replay_request(session, target, record, tokens, default_token):
+    """Sends one captured request; returns its status, or None on failure."""
+    headers = dict(record.get("headers") or {})
+    token = (
+        tokens.get(record.get("user"), default_token) if record.get("user") else None
+    )
+    if token:
+        headers["Authorization"] = "Bearer " + token
+
+    url = target.rstrip("/") + record["path"]
+    if record.get("query"):
+        url += "?" + record["query"]
+
+    body = record.get("body")
+    try:
+        response = session.request(
+            record["method"],
+            url,
+            headers=headers,
+            data=body.encode() if body else None,
+            timeout=30,
+        )
+    except requests.RequestException:
+        return None
+
+    return response.status_code
+
+
+def replay(records, target, concurrency=8, rate=0, tokens=None, default_token=None):
+    """
+    Replays records against target from concurrency threads. With a rate,
+    request i is sent no earlier than i / rate seconds after the start;
+    without one, requests go out as fast as the threads allow. Returns the
+    results per route and the total wall time.
+    """
+    tokens = tokens or {}
+    pending = queue.Queue()
+    for index, record in enumerate(records):
+        pending.put((index, record))
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            try:
+                index, record = pending.get_nowait()
+            except queue.Empty:
+                return
+
+            if rate:
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            sent = time.perf_counter()
+            status = replay_request(session, target, record, tokens, default_token)
+            latency = time.perf_counter() - sent
+
+            route = f"{record['method']} {record.get('route') or record['path']}"
+            with lock:
+                results[route].append((latency, status, record.get("status")))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(results, elapsed):
+    """Prints throughput, latency percentiles and error rates per route."""
+    if not results:
+        return
+
+    columns = "{:<45} {:>6} {:>8} {:>8} {:>8} {:>8} {:>7} {:>9}"
+    print(
+        columns.format(
+            "route",
+            "count",
+            "req/s",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "errors",
+            "mismatch",
+        )
+    )
+
+    rows = sorted(results.items())
+    rows.append(("all", [result for _, route in rows for result in route]))
+    for route, route_results in rows:
+        latencies = sorted(latency * 1000 for latency, _, _ in route_results)
+        errors = sum(
+            1 for _, status, _ in route_results if status is None or status >= 500
+        )
+        mismatches = sum(
+            1
+            for _, status, captured in route_results
+            if status is not None and captured is not None and status != captured
+        )
+        print(
+            columns.format(
+                route[:45],
+                len(route_results),
+                f"{len(route_results) / elapsed:.1f}",
+                f"{percentile(latencies, 0.50):.1f}",
+                f"{percentile(latencies, 0.95):.1f}",
+                f"{percentile(latencies, 0.99):.1f}",
+                f"{errors / len(route_results):.1%}",
+                f"{mismatches / len(route_results):.1%}",
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured API traffic")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("file", help="JSONL file written by the capture")
+    replay_parser.add_argument("--target", required=True, help="base URL to replay to")
+    replay_parser.add_argument("--concurrency", type=int, default=8)
+    replay_parser.add_argument(
+        "--rate", type=float, default=0, help="requests per second, 0 for no limit"
+    )
+    replay_parser.add_argument(
+        "--token", help="token sent for every captured request that had one"
+    )
+    replay_parser.add_argument(
+        "--tokens", help="JSON file mapping captured user pseudonyms to tokens"
+    )
+    args = parser.parse_args()
+
+    tokens = {}
+    if args.tokens:
+        with open(args.tokens) as file:
+            tokens = json.load(file)
+
+    records = load_records(args.file)
+    results, elapsed = replay(
+        records, args.target, args.concurrency, args.rate, tokens, args.token
+    )
+    print(f"Replayed {len(records)} requests in {elapsed:.1f} s")
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
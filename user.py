@@ -7,44 +7,114 @@
 """
 
 import json
+import threading
+from collections import OrderedDict
 
 import constants
+import db
+import metrics
+import models
 from flask import Blueprint, Flask, jsonify, request
-from google.cloud import datastore
+from google.api_core import exceptions
 
 PROJECT_ID = constants.project_id
 USERS = constants.users
 LIMIT = constants.limit
+KNOWN_USERS_SIZE = constants.known_users_size
 
 bp = Blueprint("user", __name__, url_prefix="/users")
-client = datastore.Client(project=PROJECT_ID)
+client = db.client
 
+# The subs this process has seen in Datastore, least recently used first
+_known = OrderedDict()
+_known_lock = threading.Lock()
 
-@bp.route("", methods=["GET"])
-def users_get():
+
+def _remember(sub):
+    with _known_lock:
+        _known[sub] = True
+        _known.move_to_end(sub)
+        while len(_known) > KNOWN_USERS_SIZE:
+            _known.popitem(last=False)
+
+
+def ensure_user(claims):
     """
-    Return a list of all users
+    Creates the user of a token or session on first sight, from its sub,
+    name and email, and fills in the name or email of a user created
+    without them once claims carry them. Subs already seen by this process
+    with both are trusted to exist, so that the steady state reads nothing.
     """
-    request_url = request.url
+    sub = claims["sub"]
+    with _known_lock:
+        if sub in _known:
+            _known.move_to_end(sub)
+            metrics.incr("users.known")
+            return
+
+    key = client.key(USERS, sub)
+    complete = False
+    try:
+        with client.transaction():
+            user = client.get(key)
+            if user is None:
+                user = models.User(
+                    id=sub,
+                    name=claims.get("name"),
+                    email=claims.get("email"),
+                    orders=[],
+                ).to_entity()
+                client.put(user)
+                metrics.incr("users.created")
+            else:
+                # Access tokens usually carry neither, so a user created
+                # from one gets them from the next session or ID token
+                missing = {
+                    field: claims[field]
+                    for field in ("name", "email")
+                    if not user.get(field) and claims.get(field)
+                }
+                if missing:
+                    user.update(missing)
+                    client.put(user)
+                    metrics.incr("users.updated")
+
+            complete = bool(user.get("name") and user.get("email"))
+    except exceptions.Conflict:
+        # A concurrent request wrote the user first; the next call reads it
+        pass
+
+    if complete:
+        _remember(sub)
+
+
+def users_page(limit, offset, request_url, base_url):
+    """Returns a page of users with the next link."""
     query = client.query(kind=USERS)
-    q_limit = int(request.args.get("limit", LIMIT))
-    q_offset = int(request.args.get("offset", "0"))
-    l_iterator = query.fetch(limit=q_limit, offset=q_offset)
+    l_iterator = query.fetch(limit=limit, offset=offset)
     pages = l_iterator.pages
-    users = list(next(pages))
-
-    for user in users:
-        user["id"] = user.key.name
-        user["self"] = request_url + "/" + str(user.key.name)
+    users = [
+        models.User.from_entity(user).to_dict(request_url + "/" + str(user.key.name))
+        for user in next(pages)
+    ]
 
     results = {"users": users}
     results["totalItems"] = len(users)
 
     if l_iterator.next_page_token:
-        next_offset = q_offset + q_limit
-        next_url = (
-            request.base_url + "?limit=" + str(q_limit) + "&offset=" + str(next_offset)
-        )
+        next_offset = offset + limit
+        next_url = base_url + "?limit=" + str(limit) + "&offset=" + str(next_offset)
         results["next"] = next_url
 
+    return results
+
+
+@bp.route("", methods=["GET"])
+def users_get():
+    """
+    Return a list of all users
+    """
+    q_limit = int(request.args.get("limit", LIMIT))
+    q_offset = int(request.args.get("offset", "0"))
+    results = users_page(q_limit, q_offset, request.url, request.base_url)
     return jsonify(results), 200
@@ -6,10 +6,12 @@
 # Description: Verify the JWT
 """
 
-import json
 from os import environ as env
-from urllib.request import urlopen
 
+import http_client
+import requests
+import singleflight
+import timing
 from dotenv import find_dotenv, load_dotenv
 from jose import jwt
 
@@ -20,8 +22,15 @@ if ENV_FILE:
 AUTH0_CLIENT_ID = env.get("AUTH0_CLIENT_ID")
 AUTH0_CLIENT_SECRET = env.get("AUTH0_CLIENT_SECRET")
 AUTH0_DOMAIN = env.get("AUTH0_DOMAIN")
+ADMIN_SUBS = set(filter(None, env.get("ADMIN_SUBS", "").split(",")))
 
 ALGORITHMS = ["RS256"]
+JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+
+# Requests verifying tokens at the same time share one JWKS fetch
+jwks_flights = singleflight.Group("jwks")
+# The signing keys fetched last, to check tokens without fetching them
+cached_jwks = None
 
 
 class AuthError(Exception):
@@ -30,10 +39,11 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
-def verify_jwt(request):
+def get_token(request):
+    """Returns the bearer token of a Flask or Starlette request."""
     if "Authorization" in request.headers:
         auth_header = request.headers["Authorization"].split()
-        token = auth_header[1]
+        return auth_header[1]
     else:
         raise AuthError(
             {
@@ -43,8 +53,49 @@ def verify_jwt(request):
             401,
         )
 
-    jsonurl = urlopen("https://" + AUTH0_DOMAIN + "/.well-known/jwks.json")
-    jwks = json.loads(jsonurl.read())
+
+def jwks_unavailable():
+    return AuthError(
+        {
+            "code": "jwks_unavailable",
+            "description": "Unable to fetch the signing keys, try again later",
+        },
+        503,
+    )
+
+
+def verify_jwt(request):
+    global cached_jwks
+
+    with timing.phase("jwt"):
+        token = get_token(request)
+
+        try:
+            jwks = jwks_flights.do(JWKS_URL, lambda: http_client.get_json(JWKS_URL))
+        except (requests.RequestException, ValueError):
+            raise jwks_unavailable()
+
+        cached_jwks = jwks
+        return decode_token(token, jwks)
+
+
+def cached_claims(token):
+    """
+    Returns the claims of a token if it verifies against the cached signing
+    keys, or None. It never fetches the keys, so it may run before a request
+    is admitted.
+    """
+    if cached_jwks is None:
+        return None
+
+    try:
+        return decode_token(token, cached_jwks)
+    except (AuthError, KeyError):
+        return None
+
+
+def decode_token(token, jwks):
+    """Verifies a token against the signing keys and returns its claims."""
     try:
         unverified_header = jwt.get_unverified_header(token)
     except jwt.JWTError:
@@ -114,3 +165,14 @@ def verify_jwt(request):
         raise AuthError(
             {"code": "no_rsa_key", "description": "No RSA key in JWKS"}, 401
         )
+
+
+def verify_admin(request):
+    """Verifies the JWT and requires its sub to be listed in ADMIN_SUBS."""
+    payload = verify_jwt(request)
+    if payload["sub"] not in ADMIN_SUBS:
+        raise AuthError(
+            {"code": "forbidden", "description": "Admin access is required"}, 403
+        )
+
+    return payload